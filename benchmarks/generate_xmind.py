@@ -0,0 +1,194 @@
+#!/usr/bin/env python
+# _*_ coding:utf-8 _*_
+import argparse
+import io
+import random
+import zipfile
+from xml.sax.saxutils import escape, quoteattr
+
+"""
+Generate a synthetic XMind 8 workbook for benchmarks, in the layout of the testcase template:
+
+    product(root topic) -> testsuite -> [intermediate topics...] -> testcase -> test step -> expected result
+
+The content.xml is written to the zip entry while it is generated, so workbooks of millions of topics
+never have to be held in memory. The file can be loaded by both `xmind.load` and `xmind2testcase.reader`.
+
+Usage:
+    python benchmarks/generate_xmind.py out.xmind --sheets 4 --suites 10 --depth 2 --fanout 5 --cases 10 --steps 3
+"""
+
+CONTENT_HEADER = '<?xml version="1.0" encoding="UTF-8" standalone="no"?>' \
+                 '<xmap-content xmlns="urn:xmind:xmap:xmlns:content:2.0" xmlns:fo="http://www.w3.org/1999/XSL/Format" ' \
+                 'xmlns:svg="http://www.w3.org/2000/svg" xmlns:xhtml="http://www.w3.org/1999/xhtml" ' \
+                 'xmlns:xlink="http://www.w3.org/1999/xlink" version="2.0">'
+CONTENT_FOOTER = '</xmap-content>'
+MANIFEST = '<?xml version="1.0" encoding="UTF-8" standalone="no"?>' \
+           '<manifest xmlns="urn:xmind:xmap:xmlns:manifest:1.0">' \
+           '<file-entry full-path="content.xml" media-type="text/xml"/>' \
+           '<file-entry full-path="comments.xml" media-type="text/xml"/>' \
+           '<file-entry full-path="META-INF/" media-type=""/>' \
+           '<file-entry full-path="META-INF/manifest.xml" media-type="text/xml"/>' \
+           '<file-entry full-path="meta.xml" media-type="text/xml"/></manifest>'
+META = '<?xml version="1.0" encoding="UTF-8" standalone="no"?>' \
+       '<meta xmlns="urn:xmind:xmap:xmlns:meta:2.0" version="2.0"><Creator><Name>xmind2testcase benchmarks</Name></Creator></meta>'
+
+RESULT_MARKERS = ('symbol-right', 'symbol-wrong', 'symbol-pause', 'symbol-minus')
+LABELS = ('手动', '自动', 'manual', 'auto')
+SEPARATORS = ' &>+/-'
+
+
+class XMindGenerator(object):
+
+    def __init__(self, sheets=1, suites=5, depth=1, fanout=3, cases=5, steps=3, priority_ratio=0.8,
+                 result_ratio=0.3, note_ratio=0.1, label_ratio=0.1, comment_ratio=0.05, ignore_ratio=0.02, seed=0):
+        """
+        XMindGenerator
+        :param sheets: number of sheets, each sheet is a product
+        :param suites: number of testsuites in every sheet
+        :param depth: number of intermediate topic levels between a testsuite and its testcases
+        :param fanout: number of children of every intermediate topic
+        :param cases: number of testcases under every deepest intermediate topic (or testsuite if depth is 0)
+        :param steps: number of test steps of every testcase, every step has an expected result
+        :param priority_ratio: ratio of the testcases with a priority marker
+        :param result_ratio: ratio of the expected results with a test result marker (right/wrong/pause/minus)
+        :param note_ratio: ratio of the topics with a note (precondition)
+        :param label_ratio: ratio of the topics with a label (execution type)
+        :param comment_ratio: ratio of the topics with a comment (summary)
+        :param ignore_ratio: ratio of the topics whose title starts with an ignore char
+        :param seed: random seed, the same arguments always generate the same workbook
+        """
+        self.sheets = sheets
+        self.suites = suites
+        self.depth = depth
+        self.fanout = fanout
+        self.cases = cases
+        self.steps = steps
+        self.priority_ratio = priority_ratio
+        self.result_ratio = result_ratio
+        self.note_ratio = note_ratio
+        self.label_ratio = label_ratio
+        self.comment_ratio = comment_ratio
+        self.ignore_ratio = ignore_ratio
+        self.random = random.Random(seed)
+        self.topic_count = 0
+        self.comments = []  # (topic id, comment)
+
+    def expected_topic_count(self):
+        """The number of topics in the generated workbook"""
+        case_topics = 1 + self.steps * 2
+        leaf_count = self.fanout ** self.depth
+        node_count = sum(self.fanout ** level for level in range(1, self.depth + 1))
+        suite_topics = 1 + node_count + leaf_count * self.cases * case_topics
+        return self.sheets * (1 + self.suites * suite_topics)
+
+    def write(self, xmind_file):
+        with zipfile.ZipFile(xmind_file, 'w', zipfile.ZIP_DEFLATED) as zip_file:
+            with zip_file.open('content.xml', 'w') as stream:
+                f = io.TextIOWrapper(stream, encoding='utf-8')
+                self.write_content(f)
+                f.flush()
+                f.detach()
+            zip_file.writestr('comments.xml', self.comments_xml())
+            zip_file.writestr('META-INF/manifest.xml', MANIFEST)
+            zip_file.writestr('meta.xml', META)
+        return xmind_file
+
+    def write_content(self, f):
+        f.write(CONTENT_HEADER)
+        for sheet_num in range(1, self.sheets + 1):
+            f.write('<sheet id="sheet-{0}"><title>画布 {0}</title>'.format(sheet_num))
+            separator = SEPARATORS[sheet_num % len(SEPARATORS)].strip()
+            self.write_topic_start(f, '产品 {}{}'.format(sheet_num, separator), note=False)
+            f.write('<children><topics type="attached">')
+            for suite_num in range(1, self.suites + 1):
+                self.write_topic_start(f, self.title('模块 {}'.format(suite_num)))
+                self.write_children(f, self.depth)
+                f.write('</topic>')
+            f.write('</topics></children></topic></sheet>')
+        f.write(CONTENT_FOOTER)
+
+    def write_children(self, f, depth):
+        f.write('<children><topics type="attached">')
+        if depth > 0:
+            for num in range(1, self.fanout + 1):
+                self.write_topic_start(f, self.title('功能点 {}'.format(num)))
+                self.write_children(f, depth - 1)
+                f.write('</topic>')
+        else:
+            for num in range(1, self.cases + 1):
+                self.write_testcase(f, num)
+        f.write('</topics></children>')
+
+    def write_testcase(self, f, num):
+        markers = []
+        if self.random.random() < self.priority_ratio:
+            markers.append('priority-{}'.format(self.random.randint(1, 3)))
+        self.write_topic_start(f, self.title('测试用例 {}'.format(num)), markers)
+
+        if self.steps:
+            f.write('<children><topics type="attached">')
+            for step_num in range(1, self.steps + 1):
+                self.write_topic_start(f, '测试步骤 {}'.format(step_num), note=False)
+                f.write('<children><topics type="attached">')
+                markers = [self.random.choice(RESULT_MARKERS)] if self.random.random() < self.result_ratio else []
+                self.write_topic_start(f, '预期结果 {}'.format(step_num), markers, note=False)
+                f.write('</topic></topics></children></topic>')
+            f.write('</topics></children>')
+
+        f.write('</topic>')
+
+    def write_topic_start(self, f, title, markers=None, note=True):
+        """Write a topic start tag with its title, labels, markers and notes, the caller writes the end tag"""
+        self.topic_count += 1
+        topic_id = 'topic-{}'.format(self.topic_count)
+        f.write('<topic id={}><title>{}</title>'.format(quoteattr(topic_id), escape(title)))
+
+        if self.random.random() < self.label_ratio:
+            f.write('<labels><label>{}</label></labels>'.format(self.random.choice(LABELS)))
+        if markers:
+            f.write('<marker-refs>')
+            for marker in markers:
+                f.write('<marker-ref marker-id={}/>'.format(quoteattr(marker)))
+            f.write('</marker-refs>')
+        if note and self.random.random() < self.note_ratio:
+            f.write('<notes><plain>{}</plain></notes>'.format(escape('前置条件 {}\n第二行'.format(self.topic_count))))
+        if self.random.random() < self.comment_ratio:
+            self.comments.append((topic_id, '备注 {}'.format(self.topic_count)))
+
+    def title(self, title):
+        return '#' + title if self.random.random() < self.ignore_ratio else title
+
+    def comments_xml(self):
+        items = ['<comment object-id={} author="benchmarks" time="0"><content>{}</content></comment>'.format(
+            quoteattr(topic_id), escape(content)) for topic_id, content in self.comments]
+        return '<?xml version="1.0" encoding="UTF-8" standalone="no"?>' \
+               '<comments xmlns="urn:xmind:xmap:xmlns:comments:2.0" version="2.0">{}</comments>'.format(''.join(items))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate a synthetic XMind testcase workbook for benchmarks')
+    parser.add_argument('xmind_file')
+    parser.add_argument('--sheets', type=int, default=1)
+    parser.add_argument('--suites', type=int, default=5)
+    parser.add_argument('--depth', type=int, default=1)
+    parser.add_argument('--fanout', type=int, default=3)
+    parser.add_argument('--cases', type=int, default=5)
+    parser.add_argument('--steps', type=int, default=3)
+    parser.add_argument('--priority-ratio', type=float, default=0.8)
+    parser.add_argument('--result-ratio', type=float, default=0.3)
+    parser.add_argument('--note-ratio', type=float, default=0.1)
+    parser.add_argument('--label-ratio', type=float, default=0.1)
+    parser.add_argument('--comment-ratio', type=float, default=0.05)
+    parser.add_argument('--ignore-ratio', type=float, default=0.02)
+    parser.add_argument('--seed', type=int, default=0)
+    args = vars(parser.parse_args())
+
+    xmind_file = args.pop('xmind_file')
+    generator = XMindGenerator(**args)
+    generator.write(xmind_file)
+    print('Generated {} with {} topics'.format(xmind_file, generator.topic_count))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,210 @@
+#!/usr/bin/env python
+# _*_ coding:utf-8 _*_
+import argparse
+import copy
+import gc
+import json
+import logging
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import xmind
+from generate_xmind import XMindGenerator
+from xmind2testcase.__about__ import __version__
+from xmind2testcase.parser import filter_empty_or_ignore_topic, sheet_to_suite
+from xmind2testcase.reader import get_xmind_content
+from xmind2testcase.testlink import testsuites_to_testlink_xml_file
+from xmind2testcase.utils import get_xmind_testsuite_list, get_xmind_testsuites, testsuites_to_testcase_json_file, \
+    testsuites_to_testsuite_json_file
+from xmind2testcase.zentao import testsuites_to_zentao_csv_file
+
+"""
+Measure every stage of the conversion pipeline on XMind files, and compare the results between runs
+
+Every stage is run `--repeat` times for the wall time (min and median), then once more under tracemalloc
+for the peak memory. The results are written as json, e.g.
+
+    python benchmarks/run_benchmarks.py --preset medium --output before.json
+    python benchmarks/run_benchmarks.py --preset medium --output after.json --compare before.json
+"""
+
+PRESETS = {
+    'small': dict(sheets=1, suites=5, depth=1, fanout=3, cases=5, steps=3),                 # ~0.5k topics
+    'medium': dict(sheets=4, suites=10, depth=2, fanout=4, cases=8, steps=3),               # ~37k topics
+    'large': dict(sheets=10, suites=20, depth=2, fanout=5, cases=10, steps=3),              # ~0.36m topics
+    'huge': dict(sheets=40, suites=20, depth=2, fanout=5, cases=10, steps=3),               # ~1.4m topics
+}
+
+# the xmind library looks up the comments of every topic in all comments, which is quadratic on large maps
+LEGACY_STAGE = 'xmind.load+getData'
+LEGACY_MAX_TOPICS = 20000
+
+STAGES = (LEGACY_STAGE, 'reader.get_xmind_content', 'filter_empty_or_ignore_topic', 'sheet_to_suite',
+          'get_xmind_testsuite_list', 'testcase_json_writer', 'testsuite_json_writer', 'testlink_writer',
+          'zentao_writer')
+
+
+def prepare_stages(xmind_file, output_dir):
+    """Return {stage name: (setup, run)}, setup prepares the input of run outside of the measurement"""
+    sheets = get_xmind_content(xmind_file)
+    filtered_sheets = copy.deepcopy(sheets)
+    for sheet in filtered_sheets:
+        sheet['topic']['topics'] = filter_empty_or_ignore_topic(sheet['topic'].get('topics', []))
+    testsuites = get_xmind_testsuites(xmind_file)
+    name = os.path.splitext(os.path.basename(xmind_file))[0]
+
+    def filter_topics(sheet_list):
+        for sheet in sheet_list:
+            filter_empty_or_ignore_topic(sheet['topic'].get('topics', []))
+
+    def to_suites(sheet_list):
+        for sheet in sheet_list:
+            if sheet['topic']['topics']:
+                sheet_to_suite(sheet['topic'])
+
+    return {
+        LEGACY_STAGE: (None, lambda _: xmind.load(xmind_file).getData()),
+        'reader.get_xmind_content': (None, lambda _: get_xmind_content(xmind_file)),
+        'filter_empty_or_ignore_topic': (lambda: copy.deepcopy(sheets), filter_topics),
+        'sheet_to_suite': (None, lambda _: to_suites(filtered_sheets)),
+        'get_xmind_testsuite_list': (None, lambda _: get_xmind_testsuite_list(xmind_file)),
+        'testcase_json_writer': (None, lambda _: testsuites_to_testcase_json_file(
+            testsuites, os.path.join(output_dir, name + '.json'))),
+        'testsuite_json_writer': (None, lambda _: testsuites_to_testsuite_json_file(
+            testsuites, os.path.join(output_dir, name + '_testsuite.json'))),
+        'testlink_writer': (None, lambda _: testsuites_to_testlink_xml_file(
+            testsuites, os.path.join(output_dir, name + '.xml'))),
+        'zentao_writer': (None, lambda _: testsuites_to_zentao_csv_file(
+            testsuites, os.path.join(output_dir, name + '.csv'))),
+    }
+
+
+def measure(setup, run, repeat):
+    """Return the wall times of `repeat` runs and the tracemalloc peak of one more run"""
+    times = []
+    for _ in range(repeat):
+        data = setup() if setup else None
+        gc.collect()
+        start = time.perf_counter()
+        run(data)
+        times.append(time.perf_counter() - start)
+
+    data = setup() if setup else None
+    gc.collect()
+    tracemalloc.start()
+    try:
+        run(data)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {'min_s': min(times), 'median_s': statistics.median(times), 'peak_bytes': peak, 'repeat': repeat}
+
+
+def count_topics(xmind_file):
+    count = 0
+    stack = [sheet['topic'] for sheet in get_xmind_content(xmind_file)]
+    while stack:
+        topic = stack.pop()
+        count += 1
+        stack.extend(topic.get('topics', []))
+    return count
+
+
+def run_benchmarks(xmind_files, stages=STAGES, repeat=3, legacy_max_topics=LEGACY_MAX_TOPICS):
+    results = {'meta': {'version': __version__,
+                        'python': platform.python_version(),
+                        'platform': platform.platform(),
+                        'cpu_count': os.cpu_count(),
+                        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S')},
+               'inputs': {},
+               'results': {}}
+    output_dir = tempfile.mkdtemp(prefix='xmind2testcase-benchmarks-')
+
+    try:
+        for xmind_file in xmind_files:
+            key = os.path.basename(xmind_file)
+            topic_count = count_topics(xmind_file)
+            results['inputs'][key] = {'bytes': os.path.getsize(xmind_file), 'topics': topic_count}
+            results['results'][key] = {}
+            prepared = prepare_stages(xmind_file, output_dir)
+
+            for stage in stages:
+                if stage == LEGACY_STAGE and topic_count > legacy_max_topics:
+                    results['results'][key][stage] = {'skipped': 'more than {} topics'.format(legacy_max_topics)}
+                    print('{:<28} {:<32} {:>10}'.format(key, stage, 'skipped'))
+                    continue
+
+                setup, run = prepared[stage]
+                result = measure(setup, run, repeat)
+                results['results'][key][stage] = result
+                print('{:<28} {:<32} {:>10.4f}s {:>10.1f}MB'.format(
+                    key, stage, result['min_s'], result['peak_bytes'] / 1024 / 1024))
+    finally:
+        shutil.rmtree(output_dir, ignore_errors=True)
+
+    return results
+
+
+def compare_results(baseline, current):
+    """Print the time and peak memory ratio (current / baseline) of every stage measured in both runs"""
+    print('\n{:<28} {:<32} {:>10} {:>10}'.format('input', 'stage', 'time', 'memory'))
+    for key, stages in current['results'].items():
+        for stage, result in stages.items():
+            base = baseline.get('results', {}).get(key, {}).get(stage)
+            if not base or 'skipped' in base or 'skipped' in result:
+                continue
+            time_ratio = result['min_s'] / base['min_s'] if base['min_s'] else float('nan')
+            memory_ratio = result['peak_bytes'] / base['peak_bytes'] if base['peak_bytes'] else float('nan')
+            print('{:<28} {:<32} {:>9.2f}x {:>9.2f}x'.format(key, stage, time_ratio, memory_ratio))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the XMind to testcase conversion pipeline')
+    parser.add_argument('xmind_files', nargs='*', help='XMind files to measure')
+    parser.add_argument('--preset', action='append', choices=sorted(PRESETS), default=[],
+                        help='generate a synthetic workbook of this size and measure it')
+    parser.add_argument('--stage', action='append', choices=STAGES, help='only measure these stages')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--legacy-max-topics', type=int, default=LEGACY_MAX_TOPICS,
+                        help='skip the xmind.load+getData stage on larger workbooks')
+    parser.add_argument('--output', help='write the results to this json file')
+    parser.add_argument('--compare', help='compare with the results json file of a previous run')
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.WARNING)
+    generated_dir = tempfile.mkdtemp(prefix='xmind2testcase-generated-')
+
+    try:
+        xmind_files = list(args.xmind_files)
+        for preset in args.preset:
+            xmind_file = os.path.join(generated_dir, 'synthetic_{}.xmind'.format(preset))
+            XMindGenerator(**PRESETS[preset]).write(xmind_file)
+            xmind_files.append(xmind_file)
+
+        if not xmind_files:
+            parser.error('at least one XMind file or --preset is required')
+
+        results = run_benchmarks(xmind_files, args.stage or STAGES, args.repeat, args.legacy_max_topics)
+    finally:
+        shutil.rmtree(generated_dir, ignore_errors=True)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf8') as f:
+            json.dump(results, f, indent=4, ensure_ascii=False)
+
+    if args.compare:
+        with open(args.compare, encoding='utf8') as f:
+            compare_results(json.load(f), results)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,171 @@
+#!/usr/bin/env python
+# _*_ coding:utf-8 _*_
+import io
+import json
+import os
+import time
+import zipfile
+from xmind2testcase.reader import CONTENT_XML, CONTENT_JSON
+from xmind2testcase.utils import new_temp_file
+
+"""
+Write sheet/topic dicts (the same shape as `xmind2testcase.reader` reads) into a XMind file
+
+The content.xml (XMind 8) or the content.json (XMind Zen and the later versions) is serialized straight into the
+zip entry, topic by topic, without building a DOM or calling the xmind library for every topic.
+"""
+
+CONTENT_NAMESPACES = ('xmlns="urn:xmind:xmap:xmlns:content:2.0" xmlns:fo="http://www.w3.org/1999/XSL/Format" '
+                      'xmlns:svg="http://www.w3.org/2000/svg" xmlns:xhtml="http://www.w3.org/1999/xhtml" '
+                      'xmlns:xlink="http://www.w3.org/1999/xlink"')
+MANIFEST_XML = 'META-INF/manifest.xml'
+META_XML = 'meta.xml'
+MANIFEST_JSON = 'manifest.json'
+METADATA_JSON = 'metadata.json'
+WRITE_CHUNKS = 4096  # the xml chunks joined for one write
+
+
+def write_xmind_file(xmind_file, sheets, content_file_name=CONTENT_XML):
+    """Write the sheets into a new XMind file, it replaces xmind_file once the whole file is written
+
+    :param sheets: an iterable of sheet dicts: {'title': ..., 'topic': topic dict}, a topic dict has the title, note,
+                   label, markers and its subtopics in 'topics', like the ones read by `xmind2testcase.reader`
+    :param content_file_name: CONTENT_XML for XMind 8, or CONTENT_JSON for XMind Zen and the later versions
+    """
+    fd, temp_file = new_temp_file(xmind_file)
+    try:
+        with open(fd, 'wb') as zip_stream, zipfile.ZipFile(zip_stream, 'w', zipfile.ZIP_DEFLATED) as zip_file:
+            content_info = zipfile.ZipInfo(content_file_name, time.localtime()[:6])
+            content_info.compress_type = zipfile.ZIP_DEFLATED
+            with zip_file.open(content_info, 'w') as content_stream:
+                f = io.TextIOWrapper(content_stream, encoding='utf-8')
+                if content_file_name == CONTENT_JSON:
+                    write_content_json(f, sheets)
+                else:
+                    write_content_xml(f, sheets)
+                f.flush()
+                f.detach()
+
+            if content_file_name == CONTENT_JSON:
+                zip_file.writestr(METADATA_JSON, json.dumps({'creator': {'name': 'xmind2testcase'}}))
+                zip_file.writestr(MANIFEST_JSON, json.dumps({'file-entries': {CONTENT_JSON: {}, METADATA_JSON: {}}}))
+            else:
+                zip_file.writestr(META_XML, '<?xml version="1.0" encoding="UTF-8" standalone="no"?>'
+                                            '<meta xmlns="urn:xmind:xmap:xmlns:meta:2.0" version="2.0"/>')
+                zip_file.writestr(MANIFEST_XML, '<?xml version="1.0" encoding="UTF-8" standalone="no"?>'
+                                                '<manifest xmlns="urn:xmind:xmap:xmlns:manifest:1.0">'
+                                                '<file-entry full-path="{}" media-type="text/xml"/>'
+                                                '<file-entry full-path="{}" media-type="text/xml"/>'
+                                                '<file-entry full-path="META-INF/" media-type=""/>'
+                                                '<file-entry full-path="{}" media-type="text/xml"/>'
+                                                '</manifest>'.format(CONTENT_XML, META_XML, MANIFEST_XML))
+        os.replace(temp_file, xmind_file)
+    finally:
+        if os.path.exists(temp_file):
+            os.remove(temp_file)
+
+    return xmind_file
+
+
+def write_content_xml(f, sheets):
+    timestamp = _timestamp()
+    f.write('<?xml version="1.0" encoding="UTF-8" standalone="no"?>')
+    f.write('<xmap-content {} timestamp="{}" version="2.0">'.format(CONTENT_NAMESPACES, timestamp))
+    for sheet in sheets:
+        f.write('<sheet id="{}" timestamp="{}">'.format(_new_id(), timestamp))
+        chunks = []
+        for chunk in iter_topic_xml(sheet['topic'], timestamp):
+            chunks.append(chunk)
+            if len(chunks) >= WRITE_CHUNKS:
+                f.write(''.join(chunks))
+                chunks = []
+        f.write(''.join(chunks))
+        f.write('<title>{}</title></sheet>'.format(_escape(sheet['title'] or '')))
+    f.write('</xmap-content>')
+
+
+def iter_topic_xml(topic, timestamp):
+    """Yield the xml of a topic and its subtopics chunk by chunk, without recursion"""
+    stack = [topic]
+    while stack:
+        topic = stack.pop()
+        if isinstance(topic, str):  # the end tags of a topic with subtopics
+            yield topic
+            continue
+
+        yield '<topic id="{}" timestamp="{}"><title>{}</title>'.format(_new_id(), timestamp,
+                                                                       _escape(topic.get('title') or ''))
+        if topic.get('note'):
+            yield '<notes><plain>{}</plain></notes>'.format(_escape(topic['note']))
+        if topic.get('markers'):
+            yield '<marker-refs>{}</marker-refs>'.format(''.join(
+                '<marker-ref marker-id="{}"/>'.format(_escape(marker)) for marker in topic['markers']))
+        if topic.get('label'):
+            yield '<labels><label>{}</label></labels>'.format(_escape(topic['label']))
+
+        if topic.get('topics'):
+            yield '<children><topics type="attached">'
+            stack.append('</topics></children></topic>')
+            stack.extend(reversed(topic['topics']))
+        else:
+            yield '</topic>'
+
+
+def write_content_json(f, sheets):
+    """Write the sheets as a json array, every subtopic of a root topic is encoded at once by the C json encoder"""
+    f.write('[')
+    for index, sheet in enumerate(sheets):
+        f.write('{}{{"id":{},"class":"sheet","title":{},"rootTopic":'.format(
+            ',' if index else '', _json_dumps(_new_id()), _json_dumps(sheet['title'] or '')))
+        root_topic = sheet['topic']
+        root_json = _json_dumps(_new_zen_topic(root_topic))
+        if root_topic.get('topics'):
+            f.write(root_json[:-1] + ',"children":{"attached":[')
+            for child_index, topic in enumerate(root_topic['topics']):
+                f.write((',' if child_index else '') + _json_dumps(topic_to_zen(topic)))
+            f.write(']}}')
+        else:
+            f.write(root_json)
+        f.write('}')
+    f.write(']')
+
+
+def topic_to_zen(topic):
+    """Convert a topic dict and its subtopics to a XMind Zen topic, without recursion"""
+    zen_topic = _new_zen_topic(topic)
+    stack = [(topic, zen_topic)]
+    while stack:
+        topic, parent = stack.pop()
+        if topic.get('topics'):
+            children = [_new_zen_topic(child) for child in topic['topics']]
+            parent['children'] = {'attached': children}
+            stack.extend(zip(topic['topics'], children))
+
+    return zen_topic
+
+
+def _new_zen_topic(topic):
+    zen_topic = {'id': _new_id(), 'class': 'topic', 'title': topic.get('title') or ''}
+    if topic.get('note'):
+        zen_topic['notes'] = {'plain': {'content': topic['note']}}
+    if topic.get('markers'):
+        zen_topic['markers'] = [{'markerId': marker} for marker in topic['markers']]
+    if topic.get('label'):
+        zen_topic['labels'] = [topic['label']]
+    return zen_topic
+
+
+def _new_id():
+    return os.urandom(13).hex()  # 26 random hex digits, the same length as the ids of XMind
+
+
+def _json_dumps(data):
+    return json.dumps(data, ensure_ascii=False, separators=(',', ':'))
+
+
+def _timestamp():
+    return str(int(time.time() * 1000))
+
+
+def _escape(value):
+    return value.replace('&', '&amp;').replace('<', '&lt;').replace('"', '&quot;').replace('>', '&gt;')
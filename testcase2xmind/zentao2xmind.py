@@ -1,45 +1,125 @@
 import os
 import csv
-import xmind
+import re
 import logging
-from xmind.core import workbook,saver
+from collections import OrderedDict
+from testcase2xmind.writer import write_xmind_file
+from xmind2testcase.reader import CONTENT_XML, CONTENT_JSON
 from xmind2testcase.utils import get_absolute_path
 
+STEP_NUMBER_PATTERN = re.compile(r'^\s*(\d+)\s*[.、)]\s*(.*)$')  # 禅道步骤、预期的编号：'1. 测试步骤1'
+PRIORITY_MARKER = 'priority-{}'
+PRIORITY_NUMBERS = {'高': '1', '中': '2', '低': '3'}  # 禅道导出的优先级可能是数字，也可能是高、中、低
+DEFAULT_PRIORITY = '2'  # 与 xmind2testcase.zentao.gen_case_priority 的默认值相同
+AUTOMATE_LABEL = '自动'
+DEFAULT_MODULE = '/'
 
-def zentao_csv_file_to_xmind(zentao_csv_file):
-    """将禅道导出的csv用例文件转为xmind思维导图"""
+
+def zentao_csv_file_to_xmind(zentao_csv_file, zen=False):
+    """将禅道导出的csv用例文件转为xmind思维导图：根主题 → 所属模块 → 用例 → 步骤 → 预期
+
+    转换后的思维导图可以再用 xmind2testcase 转换为禅道、TestLink 用例
+
+    :param zen: 保存为 XMind Zen 及以后版本的格式（content.json），默认为 XMind 8 的格式（content.xml）
+    """
     zentao_csv_file = get_absolute_path(zentao_csv_file)
     zentao_csv_file_name = zentao_csv_file[:-4]
     logging.info('Start converting zentao_csv file(%s) to xmind file...', zentao_csv_file)
-    testcases = []
-    with open(zentao_csv_file, newline='', encoding='utf-8') as csvfile:
-        reader = csv.DictReader(csvfile)
-        for row in reader:
-            testcases.append(row)
-
-    # 创建 XMind 思维导图
-    workbook = xmind.load(zentao_csv_file_name + '.xmind')
-    sheet = workbook.getPrimarySheet()
-    sheet.setTitle(zentao_csv_file_name + '测试用例')
-    root_topic = sheet.getRootTopic()
-    root_topic.setTitle(zentao_csv_file_name + '测试用例')
-
-    # 将测试用例数据添加到思维导图中
-    for testcase in testcases:
-        topic = root_topic.addSubTopic()
-        topic.setTitle(testcase['用例标题'])
-        subtopic1 = topic.addSubTopic()
-        subtopic1.setTitle(f'步骤: {testcase["步骤"]}')
-        subtopic2 = subtopic1.addSubTopic()
-        subtopic2.setTitle(f'预期: {testcase["预期"]}')
-
-    # 保存 XMind 文件
-    csv_to_xmind_file = xmind.save(workbook, path = zentao_csv_file_name + '.xmind')
+
+    title = os.path.basename(zentao_csv_file_name) + '测试用例'
+    root_topic = _new_topic(title)
+    root_topic['topics'] = list(read_zentao_csv_modules(zentao_csv_file).values())
+
+    # 直接写入 content.xml / content.json，不通过 xmind 库逐个创建主题
+    csv_to_xmind_file = write_xmind_file(zentao_csv_file_name + '.xmind', [{'title': title, 'topic': root_topic}],
+                                         CONTENT_JSON if zen else CONTENT_XML)
     logging.info('Convert zentao_csv file(%s) to a xmind file(%s) successfully!', zentao_csv_file_name, csv_to_xmind_file)
 
     return csv_to_xmind_file
 
 
+def read_zentao_csv_modules(zentao_csv_file):
+    """逐行读取禅道csv用例文件，按所属模块分组，返回 {所属模块: 模块主题}，模块按第一次出现的顺序排列"""
+    modules = OrderedDict()
+    with open(zentao_csv_file, newline='', encoding='utf-8-sig') as csvfile:  # 兼容带 BOM 的 utf-8 文件
+        for row in csv.DictReader(csvfile):
+            case_topic = zentao_row_to_topic(row)
+            if case_topic is None:
+                continue
+
+            module = (row.get('所属模块') or '').strip() or DEFAULT_MODULE
+            module_topic = modules.get(module)
+            if module_topic is None:
+                module_topic = modules[module] = _new_topic(module)
+                module_topic['topics'] = []
+            module_topic['topics'].append(case_topic)
+
+    return modules
+
+
+def zentao_row_to_topic(row):
+    """一行禅道用例转为用例主题：前置条件为备注，优先级为标记，自动化用例带有'自动'标签，子主题为步骤，步骤的子主题为预期"""
+    title = (row.get('用例标题') or '').strip()
+    if not title:
+        logging.warning('Skip a zentao testcase without title: %s', row)
+        return None
+
+    topic = _new_topic(title)
+    preconditions = (row.get('前置条件') or '').strip()
+    if preconditions:
+        topic['note'] = preconditions
+    # 用例主题必须带有优先级标记，否则会被当作中间主题，步骤被解析成用例
+    topic['markers'].append(PRIORITY_MARKER.format(get_priority_number(row.get('优先级'))))
+    if AUTOMATE_LABEL in (row.get('用例类型') or ''):
+        topic['label'] = AUTOMATE_LABEL
+
+    expected_results = OrderedDict(split_numbered_text(row.get('预期') or ''))
+    steps = []
+    for number, action in split_numbered_text(row.get('步骤') or ''):
+        step_topic = _new_topic(action)
+        expected = expected_results.pop(number, None)
+        if expected:
+            step_topic['topics'] = [_new_topic(expected)]
+        steps.append(step_topic)
+    if not steps and expected_results:
+        # 只有预期没有步骤时，预期挂在一个空步骤下会被忽略，作为步骤保留下来
+        steps = [_new_topic(expected) for expected in expected_results.values()]
+    if steps:
+        topic['topics'] = steps
+
+    return topic
+
+
+def get_priority_number(priority):
+    """禅道的优先级转为 XMind 优先级标记的数字：数字不变，高、中、低为 1、2、3，为空或无法识别时为默认的 2"""
+    priority = (priority or '').strip()
+    if priority.isdigit():
+        return priority
+    return PRIORITY_NUMBERS.get(priority, DEFAULT_PRIORITY)
+
+
+def split_numbered_text(text):
+    """把禅道的 '1. 步骤1\\n2. 步骤2\\n' 拆分为 [('1', '步骤1'), ('2', '步骤2')]，没有编号的行属于上一个编号
+
+    整段文字都没有编号时作为编号 '1' 的一项
+    """
+    items = []
+    for line in text.splitlines():
+        match = STEP_NUMBER_PATTERN.match(line)
+        if match:
+            items.append([match.group(1), match.group(2).strip()])
+        elif items:
+            items[-1][1] = (items[-1][1] + '\n' + line.strip()).strip()
+        elif line.strip():
+            items.append(['1', line.strip()])
+
+    return [(number, content) for number, content in items if content]
+
+
+def _new_topic(title):
+    return {'title': title, 'note': None, 'label': None, 'comment': None, 'markers': []}
+
+
 if __name__ == '__main__':
     zentao_csv_file = '../webtool/uploads/直采系统-第1期测试用例-转csv.csv'
-    zentao_csv_file_to_xmind(zentao_csv_file)
\ No newline at end of file
+    zentao_csv_file_to_xmind(zentao_csv_file)
@@ -0,0 +1,49 @@
+#!/usr/bin/env python
+# _*_ coding:utf-8 _*_
+import csv
+import os
+import shutil
+import tempfile
+import unittest
+
+from testcase2xmind.zentao2xmind import zentao_csv_file_to_xmind, get_priority_number
+from xmind2testcase.zentao import xmind_to_zentao_csv_file
+
+here = os.path.abspath(os.path.dirname(__file__))
+TEMPLATE_CSV = os.path.join(here, '..', 'docs', 'xmind_testcase_template_v1.1.csv')
+
+
+def read_rows(csv_file):
+    with open(csv_file, newline='', encoding='utf-8-sig') as f:
+        return list(csv.DictReader(f))
+
+
+class ZentaoToXMindTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.temp_dir)
+
+    def test_priority_number(self):
+        self.assertEqual(['1', '2', '3', '4', '2', '2'],
+                         [get_priority_number(priority) for priority in ('高', '中', '低', '4', '', None)])
+
+    def test_template_round_trip(self):
+        """禅道模板 csv → xmind → 禅道 csv，每一行仍是一个用例，步骤和预期不丢失"""
+        expected_rows = read_rows(TEMPLATE_CSV)
+        for zen in (False, True):
+            with self.subTest(zen=zen):
+                csv_file = os.path.join(self.temp_dir, 'template_zen.csv' if zen else 'template.csv')
+                shutil.copyfile(TEMPLATE_CSV, csv_file)
+                xmind_file = zentao_csv_file_to_xmind(csv_file, zen=zen)
+                rows = read_rows(xmind_to_zentao_csv_file(xmind_file))
+
+                self.assertEqual(len(expected_rows), len(rows))
+                for expected, row in zip(expected_rows, rows):
+                    for column in ('所属模块', '用例标题', '前置条件', '步骤', '预期'):
+                        self.assertEqual(expected[column].strip(), row[column].strip(), column)
+                    self.assertEqual(get_priority_number(expected['优先级']), row['优先级'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -2,61 +2,61 @@
 # _*_ coding:utf-8 _*_
 import logging
 import os
+import queue
 import re
 import arrow
+import hashlib
 import sqlite3
+import sys
+import tempfile
+import threading
 from contextlib import closing
 from os.path import join, exists
 from werkzeug.utils import secure_filename
-from xmind2testcase.zentao import xmind_to_zentao_csv_file
-from xmind2testcase.testlink import xmind_to_testlink_xml_file
-from xmind2testcase.utils import get_xmind_testsuites, get_xmind_testcase_list
-from flask import Flask, request, send_from_directory, g, render_template, abort, redirect, url_for
+from xmind2testcase.artifacts import ArtifactStore
+from xmind2testcase.cache import ParseCache
+from xmind2testcase.jobs import ConversionJobQueue
+from xmind2testcase.log import setup_logging, parse_verbosity
+from xmind2testcase.session import FORMAT_XML, FORMAT_CSV
+from xmind2testcase.utils import query_testsuites_testcase_data
+from flask import Flask, request, send_from_directory, send_file, g, render_template, abort, redirect, url_for, jsonify
 
 # 获取当前脚本所在目录的绝对路径 H:\xmindTotestcase\webtool\application.py
 here = os.path.abspath(os.path.dirname(__file__))
 # 将日志文件名 'running.log' 与 here 拼接起来，得到完整的日志文件路径： log_file
 log_file = os.path.join(here, 'running.log')
 
-# log handler
-# 创建日志格式器（formatter）：包含了时间、日志名称、日志级别、模块名和函数名等信息。
-formatter = logging.Formatter('%(asctime)s  %(name)s  %(levelname)s  [%(module)s - %(funcName)s]: %(message)s')
-# 创建文件处理器（file handler）file_handler：传入日志文件路径 log_file 和编码方式 'UTF-8'
-file_handler = logging.FileHandler(log_file, encoding='UTF-8')
-# 通过 setFormatter() 方法将前面创建的日志格式器 formatter 应用到文件处理器上
-file_handler.setFormatter(formatter)
-# 最后，通过 setLevel() 方法设置文件处理器的日志级别为 logging.DEBUG，表示输出所有级别的日志，包括 DEBUG、INFO、WARNING、ERROR 和 CRITICAL 等级别的日志信息。
-file_handler.setLevel(logging.DEBUG)
-# 创建流处理器（stream handler）stream_handler：将日志消息输出到控制台。
-stream_handler = logging.StreamHandler()
-stream_handler.setFormatter(formatter)
-stream_handler.setLevel(logging.INFO)
-
-# xmind to testcase logger
-# 创建根日志记录器（root logger），并添加文件处理器（file handler）和流处理器（stream handler）作为其处理器。然后，将根日志记录器的日志级别设置为 DEBUG。
-# 根日志记录器是日志记录器层次结构中的顶级记录器，它负责处理所有未被其他具体记录器处理的日志消息。通过获取根日志记录器并为其添加处理器，可以确保所有日志消息都会被处理和记录。
-# logging.getLogger() 获取了根日志记录器的实例。然后，使用 addHandler() 方法分别将文件处理器和流处理器添加到根日志记录器中，以便将日志消息同时输出到文件和控制台。
-# 最后，使用 setLevel() 方法将根日志记录器的日志级别设置为 DEBUG，表示该记录器将处理所有级别的日志消息。
-root_logger = logging.getLogger()
-root_logger.addHandler(file_handler)
-root_logger.addHandler(stream_handler)
-root_logger.setLevel(logging.DEBUG)
-
-# flask and werkzeug logger
-# 创建名为 'werkzeug' 的日志记录器，并将文件处理器和流处理器添加为其处理器
-# werkzeug' 是一个用于处理 Web 请求的 Python 库，常用于开发 Web 应用程序。在 Flask 应用程序中，'werkzeug' 用于处理 HTTP 请求和响应，并生成与请求处理相关的日志消息。
-# 目的是将 'werkzeug' 的日志消息与应用程序的其他日志消息分开记录和处理。通过单独配置 'werkzeug' 日志记录器，可以更灵活地控制和过滤 'werkzeug' 相关的日志消息，以满足特定需求。
-werkzeug_logger = logging.getLogger('werkzeug')
-werkzeug_logger.addHandler(file_handler)
-werkzeug_logger.addHandler(stream_handler)
-werkzeug_logger.setLevel(logging.DEBUG)
-
 # global variable
 UPLOAD_FOLDER = os.path.join(here, 'uploads') # 定义了上传文件存储的目录路径。
 ALLOWED_EXTENSIONS = ['xmind'] # 定义了允许上传的文件扩展名列表。
 DEBUG = True # 表示启用调试模式
 DATABASE = os.path.join(here, 'data.db3') # 定义了 SQLite 数据库文件的路径
 HOST = '0.0.0.0' # 置为 '0.0.0.0' 表示应用程序监听所有可用的网络接口
+DATABASE_TIMEOUT = 10 # 数据库被其他连接锁定时最多等待的秒数
+CREATE_RECORDS_INDEX = 'CREATE INDEX IF NOT EXISTS idx_records_is_deleted_id ON records (is_deleted, id)'
+CREATE_RECORDS_SHA256_INDEX = 'CREATE INDEX IF NOT EXISTS idx_records_sha256 ON records (sha256)'
+UPLOAD_CHUNK_SIZE = 1024 * 1024 # 上传文件边写入磁盘边计算sha256时每次读取的字节数
+DATABASE_POOL_SIZE = 8 # 进程内复用的数据库连接数上限，超出的连接在请求结束时关闭
+_db_pool = queue.Queue(DATABASE_POOL_SIZE) # 空闲的数据库连接：(数据库路径, 连接)
+_db_ready = set() # 本进程中已经执行过 setup_db 的数据库路径
+_db_setup_lock = threading.Lock()
+
+# 解析结果缓存：以XMind文件内容的sha256为键，同一个文件的预览、下载不会重复解析
+parse_cache = ParseCache(cache_dir=os.path.join(UPLOAD_FOLDER, '.cache'))
+
+# 转换结果存储：以XMind文件内容的sha256、转换格式和版本号为键，内容相同的文件不会重复转换，也不会返回过期的转换结果
+ARTIFACT_MAX_BYTES = 512 * 1024 * 1024 # 转换结果的总大小上限，超出时删除最久未使用的
+ARTIFACT_MAX_AGE = 7 * 24 * 3600 # 超过7天未使用的转换结果会被删除
+artifact_store = ArtifactStore(os.path.join(UPLOAD_FOLDER, '.artifacts'), ARTIFACT_MAX_BYTES, ARTIFACT_MAX_AGE)
+
+# 后台转换任务队列：文件上传保存后立即在后台转换为testlink、zentao格式，下载时直接返回转换结果或等待正在进行的转换
+CONVERSION_WORKERS = 2
+
+# 预览页面分页加载测试用例，每次请求的默认条数和最大条数
+PREVIEW_PAGE_SIZE = 100
+PREVIEW_MAX_PAGE_SIZE = 500
+conversion_jobs = ConversionJobQueue(max_workers=CONVERSION_WORKERS, cache=parse_cache, formats=(FORMAT_XML, FORMAT_CSV),
+                                     store=artifact_store)
 
 # flask app
 app = Flask(__name__) # 创建一个 Flask 应用程序实例
@@ -64,13 +64,54 @@ app.config.from_object(__name__) # 加载应用程序的配置信息，__name__
 app.secret_key = os.urandom(32) # 设置了应用程序的 secret_key 为一个随机生成的字节序列，用于保证会话安全。
 
 
+def init_logging(level=logging.INFO):
+    """日志输出到控制台（默认 INFO）和 running.log（DEBUG，或更详细的 level），werkzeug 的请求日志传递给根日志记录器；
+    只在启动时配置，导入本模块不会修改日志配置。level 为 TRACE 时才会输出解析出的完整测试用例数据"""
+    setup_logging(level=level, log_file=log_file, file_level=min(level, logging.DEBUG))
+
+
+# 连接在请求之间由不同的线程使用（同一时间只有一个请求持有它），因此关闭 check_same_thread 检查
 def connect_db():
-    return sqlite3.connect(app.config['DATABASE'])
+    db = sqlite3.connect(app.config['DATABASE'], timeout=DATABASE_TIMEOUT, check_same_thread=False)
+    db.execute('PRAGMA synchronous=NORMAL')
+    return db
+
+
+# 每个进程只执行一次：由 init() 或第一次 get_db() 调用，gunicorn 等不调用 init() 的部署方式也会执行。
+# WAL 模式保存在数据库文件中，之后打开的连接都使用它；读写互不阻塞，并发上传时不再出现 database is locked
+def setup_db():
+    database = app.config['DATABASE']
+    if database in _db_ready:
+        return
+
+    with _db_setup_lock:
+        if database in _db_ready:
+            return
+
+        with closing(sqlite3.connect(database, timeout=DATABASE_TIMEOUT)) as db:
+            try:
+                db.execute('PRAGMA journal_mode=WAL')
+            except sqlite3.OperationalError as e: # 多个工作进程同时启动时，切换日志模式不等待锁，由正在切换的进程完成
+                app.logger.warning('Failed to switch the database to WAL mode: %s', e)
+            migrate_db(db)
+        _db_ready.add(database)
+
+
+# 旧数据库缺少的列和索引补建（已存在时不做任何事）；多个工作进程同时启动时由 BEGIN IMMEDIATE 依次执行
+def migrate_db(db):
+    with db:
+        db.execute('BEGIN IMMEDIATE')
+        columns = [row[1] for row in db.execute('PRAGMA table_info(records)')]
+        if columns and 'sha256' not in columns:
+            db.execute('ALTER TABLE records ADD COLUMN sha256 text')
+        if columns:
+            db.execute(CREATE_RECORDS_INDEX)
+            db.execute(CREATE_RECORDS_SHA256_INDEX)
 
 
 # 用于初始化数据库，它使用了上述的 connect_db() 函数来获取数据库连接，并执行 schema.sql 脚本文件中的 SQL 语句来创建数据库表格。
 def init_db():
-    with closing(connect_db()) as db:
+    with closing(sqlite3.connect(app.config['DATABASE'])) as db:
         with app.open_resource('schema.sql', mode='r') as f:
             db.cursor().executescript(f.read())
         db.commit()
@@ -84,80 +125,111 @@ def init():
 
     if not exists(DATABASE):
         init_db()
+    setup_db()
     app.logger.info('Congratulations! the xmind2testcase webtool database has initialized successfully!')
 
 
-# 在 Flask 中，g 是一个特殊的对象，被称为应用程序上下文（Application Context）。它是一个线程安全的对象，用于存储在整个请求生命周期中共享的数据。
-# g.db 是在 before_request 函数中创建的数据库连接对象。通过将数据库连接对象保存在 g 对象中，我们可以在整个请求处理过程中共享这个对象，而不需要在每个函数中都显式地创建和传递数据库连接对象。这样可以简化代码，并确保在请求处理过程中使用的是同一个数据库连接。
-@app.before_request
-def before_request():
-    g.db = connect_db() # g.db 被用来存储一个数据库连接对象。db 这个名称是一种常见的选择，表示数据库的缩写。可以根据个人喜好和项目要求选择其他名称，具有一定的描述性即可。
-
-
-# 在每个请求处理完成后被调用。在这个函数中，我们首先尝试从 g 对象中获取数据库连接对象 g.db，然后判断它是否存在。如果存在，表示之前成功创建了数据库连接，在这里我们将关闭数据库连接。
-# 这个函数接受一个可选的异常参数exception，用于捕获请求处理过程中发生的异常。如果请求处理过程中没有发生异常，那么 teardown_request 函数的 exception 参数将为 None。
-@app.teardown_request
-def teardown_request(exception):
+# 请求第一次访问数据库时从连接池取出一个连接，请求结束时放回，静态文件等不访问数据库的请求不会取出连接。
+# app.run 默认每个请求一个新线程，因此连接按进程复用而不是按线程保存；数据库路径变化（如测试时修改配置）的连接不再使用。
+def get_db():
     db = getattr(g, 'db', None)
-    if db is not None:
+    if db is None:
+        setup_db()
+        database = app.config['DATABASE']
+        while db is None:
+            try:
+                pooled_database, pooled_db = _db_pool.get_nowait()
+            except queue.Empty:
+                db = connect_db()
+                break
+            if pooled_database == database:
+                db = pooled_db
+            else:
+                pooled_db.close()
+        g.db = db
+        g.db_database = database
+    return db
+
+
+@app.teardown_appcontext
+def release_db(exception):
+    db = g.pop('db', None)
+    if db is None:
+        return
+
+    try:
+        db.rollback() # 请求出错时未提交的修改不会带给下一个请求
+        _db_pool.put_nowait((g.pop('db_database'), db))
+    except (sqlite3.Error, queue.Full):
         db.close()
 
 
-def insert_record(xmind_name, note=''):
-    c = g.db.cursor()
+def insert_record(xmind_name, note='', sha256=None):
+    db = get_db()
+    c = db.cursor()
     now = str(arrow.now()) # arrow.now() 返回了当前的日期和时间。arrow 是一个用于处理日期和时间的 Python 库，它提供了更方便的日期和时间操作方法。arrow.now() 返回的是一个 Arrow 对象，它表示当前的日期和时间。为了将 Arrow 对象转换为字符串，代码中使用 str(arrow.now()) 进行转换。
-    sql = "INSERT INTO records (name,create_on,note) VALUES (?,?,?)"
-    c.execute(sql, (xmind_name, now, str(note)))
-    g.db.commit()
+    sql = "INSERT INTO records (name,create_on,note,sha256) VALUES (?,?,?,?)"
+    c.execute(sql, (xmind_name, now, str(note), sha256))
+    db.commit()
 
 
-# 在Flask中，app.config是一个配置对象，用于存储应用程序的配置信息。它是一个字典对象，其中包含了应用程序的各种配置项。
-def delete_record(filename, record_id):
-    xmind_file = join(app.config['UPLOAD_FOLDER'], filename) # 配置项的访问方式为app.config['KEY_NAME']，其中KEY_NAME是配置项的名称。可以使用点号 (.) 来访问嵌套配置项。我们已在当前文件中使用app.config.from_object(__name__)来加载应用程序的配置信息，__name__表示这些配置信息从当前模块中获取
-    testlink_file = join(app.config['UPLOAD_FOLDER'], filename[:-5] + 'xml')
-    zentao_file = join(app.config['UPLOAD_FOLDER'], filename[:-5] + 'csv')
+# 查找内容相同（sha256相同）且文件仍然存在的上传记录，返回其文件名
+def find_uploaded_file(sha256):
+    sql = "SELECT name FROM records WHERE sha256 = ? AND is_deleted=0 ORDER BY id desc"
+    for (name,) in get_db().execute(sql, (sha256,)):
+        if exists(join(app.config['UPLOAD_FOLDER'], name)):
+            return name
+
+
+# 多条上传记录可能指向同一个文件，只删除不再被任何未删除记录引用的文件及其转换结果（转换结果存储中按内容sha256保存的文件）
+def remove_unreferenced_files(names):
+    db = get_db()
+    for name in set(names):
+        if db.execute("SELECT 1 FROM records WHERE name = ? AND is_deleted=0 LIMIT 1", (name,)).fetchone():
+            continue
+
+        xmind_file = join(app.config['UPLOAD_FOLDER'], name)
+        if exists(xmind_file):
+            os.remove(xmind_file)
+        conversion_jobs.forget(xmind_file)
 
-    # 使用循环遍历这三个文件路径。如果某个文件存在（使用exists函数进行检查），则使用os.remove函数将其删除。
-    for f in [xmind_file, testlink_file, zentao_file]:
-        if exists(f):
-            os.remove(f)
+        row = db.execute("SELECT sha256 FROM records WHERE name = ? AND sha256 IS NOT NULL LIMIT 1", (name,)).fetchone()
+        if row: # 旧版本的记录没有sha256，它们的转换结果由存储按最久未使用清理
+            artifact_store.remove(row[0], conversion_jobs.formats)
 
-    # 获取一个数据库游标对象c，通过执行SQL语句来更新记录的状态为已删除。SQL语句使用参数化查询，将record_id作为参数传递给SQL语句中的占位符。
-    c = g.db.cursor()
+
+# 在Flask中，app.config是一个配置对象，用于存储应用程序的配置信息。它是一个字典对象，其中包含了应用程序的各种配置项。
+def delete_record(filename, record_id):
+    # 获取数据库连接，通过执行SQL语句来更新记录的状态为已删除。SQL语句使用参数化查询，将record_id作为参数传递给SQL语句中的占位符。
+    db = get_db()
     sql = 'UPDATE records SET is_deleted=1 WHERE id = ?'
-    c.execute(sql, (record_id,))
-    g.db.commit()
+    db.execute(sql, (record_id,))
+    db.commit()
+
+    # 相同内容的其他上传记录仍然引用这个文件时保留文件
+    remove_unreferenced_files([filename])
 
 
 # 用于清理服务器上的文件和将记录标记为已删除
 def delete_records(keep=20):
     """Clean up files on server and mark the record as deleted"""
-    sql = "SELECT * from records where is_deleted<>1 ORDER BY id desc LIMIT -1 offset {}".format(keep)
-    assert isinstance(g.db, sqlite3.Connection) # 是一个断言语句，用于在代码执行时进行条件检查。它用于确保g.db对象是sqlite3.Connection类的实例。
-    c = g.db.cursor()
-    c.execute(sql)
-    rows = c.fetchall() # 使用fetchall方法获取所有的查询结果行。
-    for row in rows:
-        name = row[1] # 从查询结果中每行包含多个列，其中名称在第二列，这里则是获取行记录的名称
-        xmind_file = join(app.config['UPLOAD_FOLDER'], name)
-        testlink_file = join(app.config['UPLOAD_FOLDER'], name[:-5] + 'xml')
-        zentao_file = join(app.config['UPLOAD_FOLDER'], name[:-5] + 'csv')
+    db = get_db()
+    sql = "SELECT * from records where is_deleted=0 ORDER BY id desc LIMIT -1 offset ?"
+    rows = db.execute(sql, (int(keep),)).fetchall() # 使用fetchall方法获取所有的查询结果行。
+    if not rows:
+        return
 
-        for f in [xmind_file, testlink_file, zentao_file]:
-            if exists(f):
-                os.remove(f)
+    # 所有记录在一个事务中标记为已删除，只提交一次
+    with db:
+        db.executemany('UPDATE records SET is_deleted=1 WHERE id = ?', [(row[0],) for row in rows]) # 行记录的id在第一列
 
-        sql = 'UPDATE records SET is_deleted=1 WHERE id = ?'
-        c.execute(sql, (row[0],)) # 这里则是获取行记录的id，即从0开始计数
-        g.db.commit()
+    remove_unreferenced_files([row[1] for row in rows]) # 行记录的名称在第二列
 
 # get_records(limit=8) 函数用于获取指定数量的记录。
 def get_records(limit=8):
     short_name_length = 120 # 用于限制名称的显示长度
-    c = g.db.cursor()
-    sql = "select * from records where is_deleted<>1 order by id desc limit {}".format(int(limit)) # 限制返回的记录数量为 limit
-    c.execute(sql)
-    rows = c.fetchall()
+    sql = "select * from records where is_deleted=0 order by id desc limit ?" # 限制返回的记录数量为 limit，使用 (is_deleted, id) 索引
+    rows = get_db().execute(sql, (int(limit),)).fetchall()
 
     for row in rows:
         name, short_name, create_on, note, record_id = row[1], row[1], row[2], row[3], row[0]
@@ -196,14 +268,26 @@ def save_file(file):
     if file and allowed_file(file.filename): # 检查上传的文件是否存在，并调用 allowed_file 函数检查文件名是否符合允许的扩展名。
         # filename = check_file_name(file.filename[:-6])
         filename = file.filename # 获取上传文件的原始文件名。
+        temp_path, sha256 = save_upload_stream(file.stream) # 边写入临时文件边计算sha256，不需要再读一遍文件
+
+        existing = find_uploaded_file(sha256)
+        if existing: # 已上传过内容相同的文件：复用已保存的文件及其解析、转换结果，只为这次上传增加一条记录
+            os.remove(temp_path)
+            note = '' if existing == filename else filename
+            insert_record(existing, note, sha256)
+            conversion_jobs.submit(join(app.config['UPLOAD_FOLDER'], existing), sha256) # 已有的转换任务未过期时直接返回它
+            g.is_success = True
+            return existing
+
         upload_to = join(app.config['UPLOAD_FOLDER'], filename) # 构建上传文件的完整保存路径，其中 UPLOAD_FOLDER 是一个全局变量，表示上传文件保存的文件夹路径。join 函数用于拼接路径。
 
         if exists(upload_to): #检查文件是否已存在于保存路径中。如果文件已存在，则在文件名末尾添加时间戳，并重新构建保存路径和文件名，以避免文件名冲突
             filename = '{}_{}.xmind'.format(filename[:-6], arrow.now().strftime('%Y%m%d_%H%M%S'))
             upload_to = join(app.config['UPLOAD_FOLDER'], filename)
 
-        file.save(upload_to) # 将上传的文件保存到指定的保存路径
-        insert_record(filename) # 调用 insert_record 函数将文件名插入数据库中。
+        os.replace(temp_path, upload_to) # 将上传的临时文件移动到指定的保存路径
+        insert_record(filename, sha256=sha256) # 调用 insert_record 函数将文件名插入数据库中。
+        conversion_jobs.submit(upload_to, sha256) # 在后台立即开始转换为各个下载格式，不阻塞当前请求；上传时已计算的sha256不再重复计算
         g.is_success = True # 设置全局变量 g.is_success 为 True，表示文件保存成功。
         return filename # 返回保存后的文件名作为函数结果。
     
@@ -217,6 +301,21 @@ def save_file(file):
         g.invalid_files.append(file.filename)
 
 
+# 将上传的文件流分块写入上传目录中的临时文件，同时计算sha256，返回 (临时文件路径, sha256)
+def save_upload_stream(stream):
+    fd, temp_path = tempfile.mkstemp(dir=app.config['UPLOAD_FOLDER'], suffix='.uploading')
+    sha256 = hashlib.sha256()
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            for chunk in iter(lambda: stream.read(UPLOAD_CHUNK_SIZE), b''):
+                sha256.update(chunk)
+                f.write(chunk)
+    except Exception:
+        os.remove(temp_path)
+        raise
+    return temp_path, sha256.hexdigest()
+
+
 def verify_uploaded_files(files):
     # download the xml directly if only 1 file uploaded
     # 检查上传的文件列表 files 是否只包含一个文件。如果上传了多个文件，则不满足此条件。
@@ -269,10 +368,8 @@ def download_testlink_file(filename):
     if not exists(full_path):
         abort(404)
 
-    testlink_xmls_file = xmind_to_testlink_xml_file(full_path)
-    filename = os.path.basename(testlink_xmls_file) if testlink_xmls_file else abort(404)
-
-    return send_from_directory(app.config['UPLOAD_FOLDER'], filename, as_attachment=True)
+    # 返回后台任务的转换结果，任务未完成时等待它完成，不会重复转换
+    return send_artifact(full_path, FORMAT_XML, filename[:-6] + '.xml')
 
 
 @app.route('/<filename>/to/zentao')
@@ -282,10 +379,27 @@ def download_zentao_file(filename):
     if not exists(full_path):
         abort(404)
 
-    zentao_csv_file = xmind_to_zentao_csv_file(full_path)
-    filename = os.path.basename(zentao_csv_file) if zentao_csv_file else abort(404)
+    return send_artifact(full_path, FORMAT_CSV, filename[:-6] + '.csv')
 
-    return send_from_directory(app.config['UPLOAD_FOLDER'], filename, as_attachment=True)
+
+def send_artifact(full_path, fmt, download_name):
+    """Send the stored conversion result with ETag/Last-Modified, a request with a matching If-None-Match gets 304"""
+    artifact = conversion_jobs.get_artifact(full_path, fmt)
+    if not exists(artifact.path): # 转换结果刚好被清理时重新提交转换
+        artifact = conversion_jobs.get_artifact(full_path, fmt)
+
+    return send_file(artifact.path, as_attachment=True, download_name=download_name, etag=artifact.etag,
+                     last_modified=artifact.last_modified, conditional=True)
+
+
+@app.route('/jobs/<filename>')
+def conversion_job_status(filename):
+    """The status of the background conversion job of an uploaded file"""
+    job = conversion_jobs.get(join(app.config['UPLOAD_FOLDER'], filename))
+    if job is None:
+        return jsonify({'file': filename, 'status': None, 'error': 'No conversion job of this file'}), 404
+
+    return jsonify(job.to_dict())
 
 
 @app.route('/preview/<filename>')
@@ -295,14 +409,60 @@ def preview_file(filename):
     if not exists(full_path):
         abort(404)
 
-    testsuites = get_xmind_testsuites(full_path)
-    suite_count = 0
-    for suite in testsuites:
-        suite_count += len(suite.sub_suites)
+    # 页面只包含统计信息和筛选项，测试用例由页面滚动时分页请求 /preview/<filename>/cases 加载
+    session = get_preview_session(full_path)
+    suite_names = []
+    case_count = 0
+    for suite in session.testsuites:
+        for sub_suite in suite.sub_suites:
+            suite_names.append(sub_suite.name)
+            case_count += len(sub_suite.testcase_list)
+
+    return render_template('preview.html', name=filename, suite_count=len(suite_names), case_count=case_count,
+                           suite_names=sorted(set(suite_names)), page_size=PREVIEW_PAGE_SIZE)
+
+
+@app.route('/preview/<filename>/cases')
+def preview_cases(filename):
+    """One page of the testcases, filtered by ?suite=&priority=&result=, paged by ?offset=&limit="""
+    full_path = join(app.config['UPLOAD_FOLDER'], filename)
+
+    if not exists(full_path):
+        abort(404)
+
+    offset = max(request.args.get('offset', 0, type=int), 0)
+    limit = min(max(request.args.get('limit', PREVIEW_PAGE_SIZE, type=int), 1), PREVIEW_MAX_PAGE_SIZE)
+    suite = request.args.get('suite') or None
+    importance = request.args.get('priority', type=int)
+    result = request.args.get('result', type=int)
+
+    session = get_preview_session(full_path)
+    total, cases = query_testsuites_testcase_data(session.testsuites, offset, limit, suite, importance, result)
+    rows = []
+    for index, case in enumerate(cases, offset + 1):
+        row = case.to_dict()
+        row['index'] = index
+        rows.append(row)
+
+    return jsonify({'total': total, 'offset': offset, 'limit': limit, 'cases': rows})
+
+
+@app.route('/preview/<filename>/statistics')
+def preview_statistics(filename):
+    """The testcase counts of every sheet, testsuite and intermediate topic, for polling the progress"""
+    full_path = join(app.config['UPLOAD_FOLDER'], filename)
+
+    if not exists(full_path):
+        abort(404)
+
+    session = get_preview_session(full_path)
+    return jsonify({'file': filename, 'sheets': session.get_statistics()})
 
-    testcases = get_xmind_testcase_list(full_path)
 
-    return render_template('preview.html', name=filename, suite=testcases, suite_count=suite_count)
+# 与后台转换任务共用同一个解析结果：任务正在解析时只等待解析完成，不等待 testlink、zentao 文件的写入；
+# 任务已结束时从缓存读取，并复用任务已知的sha256作为缓存键，每次预览请求不再重新读取和计算整个文件
+def get_preview_session(full_path):
+    return conversion_jobs.get_session(full_path)
 
 
 @app.route('/delete/<filename>/<int:record_id>')
@@ -321,12 +481,14 @@ def app_error(e):
     return str(e)
 
 
-def launch(host=HOST, debug=True, port=5001):
+def launch(host=HOST, debug=True, port=5001, log_level=logging.INFO):
+    init_logging(log_level)
     init()  # initializing the database
     app.run(host=host, debug=debug, port=port)
 
 
 if __name__ == '__main__':
+    init_logging(parse_verbosity(sys.argv[1:])[1])  # python application.py [-q|-v|-vv]
     init()  # initializing the database
     app.run(HOST, debug=DEBUG, port=5001)
 
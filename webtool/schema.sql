@@ -1,3 +1,5 @@
+drop index if exists idx_records_is_deleted_id;
+drop index if exists idx_records_sha256;
 drop table if exists records;
 
 create table records (
@@ -5,5 +7,9 @@ create table records (
   name text not null,
   create_on text not null,
   note text,
-  is_deleted integer DEFAULT 0
-);
\ No newline at end of file
+  is_deleted integer DEFAULT 0,
+  sha256 text
+);
+
+create index idx_records_is_deleted_id on records (is_deleted, id);
+create index idx_records_sha256 on records (sha256);
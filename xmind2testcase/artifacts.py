@@ -0,0 +1,194 @@
+#!/usr/bin/env python
+# _*_ coding:utf-8 _*_
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+import time
+from xmind2testcase.__about__ import __version__
+from xmind2testcase.cache import config_fingerprint, file_sha256
+from xmind2testcase.parser import get_options
+
+"""
+A content-addressed store of the generated testlink/zentao/json files
+
+An artifact is keyed by the sha256 of the XMind file content, the output format, the parser options and the
+converter version, so a changed upload or a new converter never gets an old artifact, while the same content is
+never converted twice. The key is also the ETag of the artifact. The least recently used artifacts are evicted
+when the store is larger than max_bytes, and the artifacts unused for max_age seconds are evicted as well.
+"""
+
+EXTENSIONS = {'json': '.json', 'ndjson': '.ndjson', 'testsuite_json': '.testsuite.json', 'xml': '.xml', 'csv': '.csv'}
+TEMP_SUFFIX = '.tmp'
+
+
+class Artifact(object):
+    __slots__ = ('key', 'path', 'size', 'mtime')
+
+    def __init__(self, key, path, size, mtime):
+        self.key = key
+        self.path = path
+        self.size = size
+        self.mtime = mtime
+
+    @property
+    def etag(self):
+        return self.key
+
+    @property
+    def last_modified(self):
+        return self.mtime
+
+    def __repr__(self):
+        return 'Artifact({!r})'.format(self.path)
+
+
+class ArtifactStore(object):
+
+    def __init__(self, root_dir, max_bytes=512 * 1024 * 1024, max_age=7 * 24 * 3600, version=__version__):
+        """
+        ArtifactStore
+        :param root_dir: the directory of the artifacts, it is created on the first write
+        :param max_bytes: max total size of the artifacts, the least recently used ones are evicted first
+        :param max_age: the artifacts unused for this many seconds are evicted
+        :param version: the converter version, artifacts of other versions are never returned
+        """
+        self.root_dir = root_dir
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.version = version
+        self._lock = threading.Lock()
+        self._key_locks = {}  # key => [lock, number of waiting threads]
+
+    def make_key(self, content_sha256, fmt, options=None):
+        """:param content_sha256: the sha256 hex digest of the XMind file content, see `file_sha256`"""
+        sha256 = hashlib.sha256()
+        for part in (content_sha256, fmt, self.version, config_fingerprint(get_options(options).to_dict())):
+            sha256.update(part.encode('utf-8'))
+            sha256.update(b'\0')
+        return sha256.hexdigest()
+
+    def get(self, key, fmt):
+        """Return the artifact of the key, or None if it is not stored"""
+        path = self._path(key, fmt)
+        try:
+            stat = os.stat(path)
+            os.utime(path, (time.time(), stat.st_mtime))  # the access time marks it as recently used for the eviction
+        except OSError:
+            return None
+        return Artifact(key, path, stat.st_size, stat.st_mtime)
+
+    def put(self, key, fmt, write):
+        """Store the artifact written by `write(path)` under the key, a half-written file is never visible"""
+        if not os.path.exists(self.root_dir):
+            os.makedirs(self.root_dir, exist_ok=True)
+
+        path = self._path(key, fmt)
+        fd, temp_path = tempfile.mkstemp(dir=self.root_dir, suffix=TEMP_SUFFIX)
+        os.close(fd)
+        try:
+            write(temp_path)
+            os.replace(temp_path, path)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+        self.evict(keep=path)
+        return self.get(key, fmt)
+
+    def get_or_create(self, xmind_file, fmt, write, options=None, sha256=None):
+        """Return the artifact of the XMind file in a format, create it with `write(path)` if it is not stored
+
+        Concurrent calls of the same key wait for the first one instead of writing the artifact again.
+
+        :param sha256: the known sha256 of the XMind file content, the file is hashed if it is not given, pass it
+                       when getting several formats of the same file so it is hashed only once
+        """
+        key = self.make_key(sha256 or file_sha256(xmind_file), fmt, options)
+        with self._key_lock(key):
+            artifact = self.get(key, fmt)
+            if artifact is not None:
+                logging.debug('artifact store hit for XMind file(%s) in %s: %s', xmind_file, fmt, key)
+                return artifact
+
+            logging.debug('artifact store miss for XMind file(%s) in %s: %s', xmind_file, fmt, key)
+            return self.put(key, fmt, write)
+
+    def remove(self, content_sha256, formats, options=None):
+        """Remove the artifacts of a XMind file content in the formats, e.g. when the uploaded file is deleted"""
+        for fmt in formats:
+            self._remove(self._path(self.make_key(content_sha256, fmt, options), fmt))
+
+    def evict(self, keep=None):
+        """Remove the artifacts unused for max_age seconds, then the least recently used ones until max_bytes
+
+        :param keep: the path of an artifact never to remove, e.g. the one just written even if it is too large
+        """
+        now = time.time()
+        entries = []
+        for path in self._files():
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+
+            # an orphan temp file of a crashed writer is removed after max_age as well
+            last_used = stat.st_mtime if path.endswith(TEMP_SUFFIX) else max(stat.st_atime, stat.st_mtime)
+            if now - last_used > self.max_age and path != keep:
+                self._remove(path)
+            elif not path.endswith(TEMP_SUFFIX):
+                entries.append((last_used, stat.st_size, path))
+
+        total_bytes = sum(size for _, size, _ in entries)
+        entries.sort()
+        for _, size, path in entries:
+            if total_bytes <= self.max_bytes:
+                break
+            if path != keep:
+                self._remove(path)
+                total_bytes -= size
+
+    def clear(self):
+        for path in self._files():
+            self._remove(path)
+
+    def _path(self, key, fmt):
+        return os.path.join(self.root_dir, key + EXTENSIONS.get(fmt, '.' + fmt))
+
+    def _files(self):
+        if not os.path.exists(self.root_dir):
+            return []
+        return [os.path.join(self.root_dir, name) for name in os.listdir(self.root_dir)]
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+            logging.debug('evicted the artifact: %s', path)
+        except OSError:
+            pass
+
+    def _key_lock(self, key):
+        return _KeyLock(self, key)
+
+
+class _KeyLock(object):
+    """Serialize the creation of one key, the lock is dropped when no thread is using it"""
+
+    def __init__(self, store, key):
+        self.store = store
+        self.key = key
+
+    def __enter__(self):
+        with self.store._lock:
+            entry = self.store._key_locks.setdefault(self.key, [threading.Lock(), 0])
+            entry[1] += 1
+        entry[0].acquire()
+
+    def __exit__(self, *exc_info):
+        with self.store._lock:
+            entry = self.store._key_locks[self.key]
+            entry[0].release()
+            entry[1] -= 1
+            if not entry[1]:
+                del self.store._key_locks[self.key]
@@ -0,0 +1,153 @@
+#!/usr/bin/env python
+# _*_ coding:utf-8 _*_
+import glob
+import json
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from xmind2testcase.session import ConversionSession, ALL_FORMATS
+from xmind2testcase.utils import get_absolute_path, new_temp_file
+
+"""
+Convert many XMind files in parallel: every file is parsed once into all requested formats in a process pool
+"""
+
+STATE_FILE = '.xmind2testcase_batch.json'
+
+
+def find_xmind_files(paths):
+    """Expand directories (recursively) and glob patterns to a sorted list of XMind files"""
+    xmind_files = set()
+
+    for path in paths:
+        path = os.path.expanduser(path)
+        if os.path.isdir(path):
+            for root, _, names in os.walk(path):
+                for name in names:
+                    if name.endswith('.xmind'):
+                        xmind_files.add(get_absolute_path(os.path.join(root, name)))
+        elif glob.has_magic(path):
+            for name in glob.glob(path, recursive=True):
+                if name.endswith('.xmind') and os.path.isfile(name):
+                    xmind_files.add(get_absolute_path(name))
+        elif path.endswith('.xmind') and os.path.isfile(path):
+            xmind_files.add(get_absolute_path(path))
+        else:
+            logging.warning('Ignore the path which is not a XMind file or directory: %s', path)
+
+    return sorted(xmind_files)
+
+
+def convert_xmind_file(xmind_file, formats=ALL_FORMATS):
+    """Convert one XMind file to all the formats, runs in a worker process
+
+    :return: (xmind_file, {format: output file}, error message or None)
+    """
+    try:
+        session = ConversionSession(xmind_file)
+        if not session.testsuites:
+            return xmind_file, {}, 'no testsuite is found, the XMind file is invalid or empty'
+        output_files = session.convert(formats)
+        return xmind_file, output_files, None
+    except Exception as e:
+        logging.exception('Failed to convert XMind file(%s)', xmind_file)
+        return xmind_file, {}, '{}: {}'.format(e.__class__.__name__, e)
+
+
+def batch_convert(paths, formats=ALL_FORMATS, workers=None, resume=False, state_file=STATE_FILE):
+    """Convert all the XMind files found in paths with a process pool
+
+    :param paths: XMind files, directories or glob patterns
+    :param formats: some of 'json', 'ndjson', 'testsuite_json', 'xml' and 'csv'
+    :param workers: the number of worker processes, default to the number of CPUs
+    :param resume: skip the files that were converted successfully by an interrupted run and haven't changed since
+    :param state_file: the file to record the progress, it is updated as soon as a file is converted
+    :return: a list of (xmind_file, {format: output file}, error message or None), in the order of xmind files
+    """
+    xmind_files = find_xmind_files(paths)
+    formats = list(formats)
+    state = _load_state(state_file) if resume else {}
+    results = {}
+    pending = []
+
+    for xmind_file in xmind_files:
+        done = state.get(xmind_file)
+        if done and done['signature'] == _file_signature(xmind_file) and set(formats) <= set(done['output_files']) \
+                and all(os.path.exists(output_file) for output_file in done['output_files'].values()):
+            logging.info('Skip the converted XMind file: %s', xmind_file)
+            results[xmind_file] = (xmind_file, done['output_files'], None)
+        else:
+            pending.append(xmind_file)
+
+    logging.info('Start converting %s XMind files(%s skipped) with %s workers...',
+                 len(pending), len(xmind_files) - len(pending), workers or os.cpu_count())
+    start = time.time()
+
+    if pending:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(convert_xmind_file, xmind_file, formats): xmind_file for xmind_file in pending}
+            for future in as_completed(futures):
+                xmind_file = futures[future]
+                try:
+                    _, output_files, error = future.result()
+                except Exception as e:
+                    # e.g. BrokenProcessPool: a worker process died (out of memory, crashed) and took its files with it
+                    logging.error('Failed to convert XMind file(%s): %r', xmind_file, e)
+                    output_files, error = {}, '{}: {}'.format(e.__class__.__name__, e)
+                results[xmind_file] = (xmind_file, output_files, error)
+                if error is None:
+                    state[xmind_file] = {'signature': _file_signature(xmind_file), 'output_files': output_files}
+                else:
+                    state.pop(xmind_file, None)
+                _save_state(state_file, state)
+
+    logging.info('Converted %s XMind files in %.2fs', len(pending), time.time() - start)
+    return [results[xmind_file] for xmind_file in xmind_files]
+
+
+def format_summary(results):
+    """A readable per-file summary of `batch_convert` results"""
+    lines = []
+    failed = 0
+
+    for xmind_file, output_files, error in results:
+        if error is None:
+            lines.append('[OK]     {} => {}'.format(xmind_file, ', '.join(output_files[fmt] for fmt in sorted(output_files))))
+        else:
+            failed += 1
+            lines.append('[FAILED] {} => {}'.format(xmind_file, error))
+
+    lines.append('Total: {}, succeeded: {}, failed: {}'.format(len(results), len(results) - failed, failed))
+    return '\n'.join(lines)
+
+
+def _file_signature(path):
+    stat = os.stat(path)
+    return [stat.st_size, stat.st_mtime]
+
+
+def _load_state(state_file):
+    if not state_file or not os.path.exists(state_file):
+        return {}
+
+    try:
+        with open(state_file, encoding='utf8') as f:
+            return json.load(f)
+    except ValueError:
+        logging.warning('Invalid batch state file(%s), convert all files again', state_file)
+        return {}
+
+
+def _save_state(state_file, state):
+    if not state_file:
+        return
+
+    fd, temp_file = new_temp_file(state_file)  # two runs sharing a state file never write into the same temp file
+    try:
+        with open(fd, 'w', encoding='utf8') as f:
+            json.dump(state, f, ensure_ascii=False)
+        os.replace(temp_file, state_file)
+    finally:
+        if os.path.exists(temp_file):
+            os.remove(temp_file)
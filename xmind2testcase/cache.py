@@ -0,0 +1,356 @@
+#!/usr/bin/env python
+# _*_ coding:utf-8 _*_
+import hashlib
+import json
+import logging
+import os
+import pickle
+import tempfile
+import threading
+from collections import OrderedDict
+from xmind2testcase.metadata import TestSuite, TestCase, TestStep, TestStatistics
+
+"""
+Cache the parsed `xmind2testcase.metadata.TestSuite` list of a XMind file
+
+The key is the sha256 of the XMind file content plus the parser config, so an unchanged file is never parsed twice.
+Cached testsuites are shared between callers and should be treated as read-only.
+
+An edited version of a file misses that cache, but most of its topic subtrees are unchanged. The parsed testsuites
+and the testcases of their branches are kept in a `SubtreeCache` by the digests of their topic subtrees, so only the
+edited branches are parsed again.
+"""
+
+OBJECT_SIZE = 64  # the estimated memory size of a parsed object and its slots
+STRING_SIZE = 56  # the estimated memory size of a str, plus 2 bytes per char
+STATISTICS_SIZE = 512  # a `TestStatistics` with its count dicts
+
+
+def file_sha256(path, chunk_size=1024 * 1024):
+    """Return the sha256 hex digest of a file's content"""
+    sha256 = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+def config_fingerprint(config, exclude=('sep',)):
+    """A stable string of the parser config, the runtime separator 'sep' is detected per sheet so it is excluded"""
+    items = {key: value for key, value in config.items() if key not in exclude}
+    # the marker/label vocabulary is an object, its tables decide the parsed result too
+    return json.dumps(items, sort_keys=True, ensure_ascii=False, default=lambda obj: obj.to_dict())
+
+
+def subtree_digest(topic, child_digests=None):
+    """Return the digest of a topic subtree, two subtrees have the same digest only if they are parsed the same
+
+    The fields used by the parser are digested in pre-order with the number of subtopics of every topic, the topic
+    id and link are left out, so a subtree copied to another place of the map keeps its digest.
+
+    :param child_digests: the digests of the topic's subtopics, the topic is then digested from its own fields and
+                          them only (a Merkle tree node) instead of walking the whole subtree
+    """
+    blake2b = hashlib.blake2b(digest_size=16)
+    if child_digests is not None:
+        blake2b.update(_topic_fields(topic, len(child_digests)).encode('utf-8'))
+        for digest in child_digests:
+            blake2b.update(digest)
+        return blake2b.digest()
+
+    parts = []
+    stack = [topic]
+    while stack:
+        topic = stack.pop()
+        children = topic.get('topics', [])
+        parts.append(_topic_fields(topic, len(children)))
+        stack.extend(reversed(children))
+    blake2b.update(''.join(parts).encode('utf-8'))
+    return blake2b.digest()
+
+
+def estimate_size(value):
+    """Estimate the memory size of parsed testsuites, testcases, steps and statistics (or a list/tuple of them)
+
+    The objects are walked without recursion and without serializing them, so it is cheap and works for maps of
+    any depth.
+    """
+    size = 0
+    stack = [value]
+    while stack:
+        value = stack.pop()
+        value_type = type(value)
+        if value_type is TestCase:
+            size += OBJECT_SIZE + _text_size(value.name) + _text_size(value.summary) + _text_size(value.preconditions)
+            for step in value.steps or ():
+                size += OBJECT_SIZE + _text_size(step.actions) + _text_size(step.expectedresults)
+        elif value_type is TestStatistics:
+            size += STATISTICS_SIZE + _text_size(value.name)
+            stack.extend(value.children)
+        elif value_type is TestSuite:
+            size += OBJECT_SIZE + _text_size(value.name) + _text_size(value.details)
+            stack.extend(value.testcase_list or ())
+            stack.extend(value.sub_suites or ())
+            if value.stats is not None:
+                stack.append(value.stats)
+        elif value_type is TestStep:
+            size += OBJECT_SIZE + _text_size(value.actions) + _text_size(value.expectedresults)
+        elif isinstance(value, (list, tuple)):
+            size += OBJECT_SIZE + 8 * len(value)
+            stack.extend(value)
+    return size
+
+
+def _text_size(text):
+    return STRING_SIZE + 2 * len(text) if text else 0
+
+
+def _topic_fields(topic, child_count):
+    """Join the fields with control chars which can't appear in XML text, None is kept apart from ''"""
+    fields = (topic['title'], topic['note'], topic['label'], topic['comment'])
+    fields = ['\x00' if field is None else field for field in fields]
+    fields.append('\x1e'.join(topic['markers']))
+    fields.append(str(child_count))
+    return '\x1f'.join(fields) + '\x1d'
+
+
+class SubtreeCache(object):
+
+    def __init__(self, max_entries=4096, max_bytes=64 * 1024 * 1024):
+        """
+        SubtreeCache
+        :param max_entries: max number of parsed subtrees kept, the least recently used ones are evicted first
+        :param max_bytes: max total size of the parsed subtrees kept, see `estimate_size`
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.total_bytes = 0
+        self._entries = OrderedDict()  # (kind, digest, options fingerprint) => (parsed result, size)
+        self._lock = threading.RLock()
+
+    def for_sheet(self, options):
+        """Return a `SubtreeMemo` to look up the parsed subtrees of a sheet
+
+        :param options: the parser options of the sheet, including its title separator
+        """
+        return SubtreeMemo(self, config_fingerprint(options.to_dict(), exclude=()))
+
+    def get(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key][0]
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        size = estimate_size(value)
+        with self._lock:
+            if key in self._entries:
+                self.total_bytes -= self._entries.pop(key)[1]
+            if size > self.max_bytes:
+                return
+
+            self._entries[key] = (value, size)
+            self.total_bytes += size
+            while len(self._entries) > self.max_entries or self.total_bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.total_bytes -= evicted_size
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.total_bytes = 0
+
+    def statistics(self):
+        with self._lock:
+            return {'entries': len(self._entries), 'bytes': self.total_bytes, 'hits': self.hits, 'misses': self.misses}
+
+
+class SubtreeMemo(object):
+    """The parsed subtrees of one sheet in a `SubtreeCache`, looked up by the digests of its topics
+
+    A testsuite is digested from the digests of its branches, which are kept for the lookups of the branches, so
+    every topic of the sheet is digested once.
+    """
+    __slots__ = ('cache', 'fingerprint', 'digests')
+
+    def __init__(self, cache, fingerprint):
+        self.cache = cache
+        self.fingerprint = fingerprint
+        self.digests = {}  # id(topic) => digest, the topic dicts are alive while their sheet is parsed
+
+    def digest(self, topic, levels=0):
+        """Return the digest of a topic subtree, the topics of the top `levels` levels are Merkle tree nodes"""
+        digest = self.digests.get(id(topic))
+        if digest is None:
+            child_digests = None
+            if levels > 0:
+                child_digests = [self.digest(child, levels - 1) for child in topic.get('topics', [])]
+            digest = self.digests[id(topic)] = subtree_digest(topic, child_digests)
+        return digest
+
+    def get(self, kind, topic, levels=0):
+        """Return the parsed result of the topic subtree, or None if it has not been parsed"""
+        return self.cache.get((kind, self.digest(topic, levels), self.fingerprint))
+
+    def put(self, kind, topic, value, levels=0):
+        self.cache.put((kind, self.digest(topic, levels), self.fingerprint), value)
+
+
+class ParseCache(object):
+
+    def __init__(self, max_entries=32, max_bytes=256 * 1024 * 1024, cache_dir=None, max_disk_entries=256,
+                 max_subtree_entries=4096, max_subtree_bytes=64 * 1024 * 1024):
+        """
+        ParseCache
+        :param max_entries: max number of testsuite lists kept in memory
+        :param max_bytes: max total size of the testsuite lists kept in memory, see `estimate_size`
+        :param cache_dir: the optional on-disk tier, parsed results are pickled into this directory
+        :param max_disk_entries: max number of pickled results kept in cache_dir, the oldest ones are removed first
+        :param max_subtree_entries: max number of parsed subtrees kept for the edited versions of the cached files
+        :param max_subtree_bytes: max total size of those parsed subtrees, they are not counted in max_bytes
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.cache_dir = cache_dir
+        self.max_disk_entries = max_disk_entries
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.total_bytes = 0
+        self._entries = OrderedDict()  # key => (testsuites, size)
+        self._lock = threading.RLock()
+        self.subtrees = SubtreeCache(max_subtree_entries, max_subtree_bytes)
+
+    def make_key(self, xmind_file, config, sha256=None):
+        """:param sha256: the known sha256 of the XMind file content, e.g. taken when it was uploaded"""
+        content_sha256 = sha256 or file_sha256(xmind_file)
+        sha256 = hashlib.sha256()
+        sha256.update(content_sha256.encode('utf-8'))
+        sha256.update(config_fingerprint(config).encode('utf-8'))
+        return sha256.hexdigest()
+
+    def get(self, key):
+        """Return the cached testsuites of the key, or None if it is not cached"""
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key][0]
+
+            content = self._read_disk(key)
+            if content is not None:
+                try:
+                    testsuites = pickle.loads(content)
+                except Exception as e:
+                    logging.warning('Invalid parse cache file(%s), ignore it: %s', self._disk_path(key), e)
+                else:
+                    self._put_memory(key, testsuites, estimate_size(testsuites))
+                    self.disk_hits += 1
+                    return testsuites
+
+            self.misses += 1
+            return None
+
+    def put(self, key, testsuites):
+        size = estimate_size(testsuites)  # the testsuites are only pickled for the disk tier
+        with self._lock:
+            self._put_memory(key, testsuites, size)
+        self._write_disk(key, testsuites)
+
+    def get_or_parse(self, xmind_file, config, parse, sha256=None):
+        """Return the cached testsuites of the XMind file, parse it with `parse(xmind_file)` on a cache miss
+
+        :param sha256: the known sha256 of the XMind file content, the file is hashed if it is not given
+        """
+        key = self.make_key(xmind_file, config, sha256)
+        testsuites = self.get(key)
+        if testsuites is None:
+            logging.debug('parse cache miss for XMind file(%s): %s', xmind_file, key)
+            testsuites = parse(xmind_file)
+            self.put(key, testsuites)
+        else:
+            logging.debug('parse cache hit for XMind file(%s): %s', xmind_file, key)
+        return testsuites
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.subtrees.clear()
+            self.total_bytes = 0
+            for path in self._disk_files():
+                os.remove(path)
+
+    def statistics(self):
+        with self._lock:
+            return {'entries': len(self._entries),
+                    'bytes': self.total_bytes,
+                    'hits': self.hits,
+                    'disk_hits': self.disk_hits,
+                    'misses': self.misses,
+                    'subtrees': self.subtrees.statistics()}
+
+    def _put_memory(self, key, testsuites, size):
+        if key in self._entries:
+            self.total_bytes -= self._entries.pop(key)[1]
+
+        if size > self.max_bytes:
+            logging.debug('parsed testsuites(%s bytes) are too large to be cached in memory', size)
+            return
+
+        self._entries[key] = (testsuites, size)
+        self.total_bytes += size
+
+        while len(self._entries) > self.max_entries or self.total_bytes > self.max_bytes:
+            _, (_, evicted_size) = self._entries.popitem(last=False)
+            self.total_bytes -= evicted_size
+
+    def _disk_path(self, key):
+        return os.path.join(self.cache_dir, key + '.pickle')
+
+    def _disk_files(self):
+        if not self.cache_dir or not os.path.exists(self.cache_dir):
+            return []
+        return [os.path.join(self.cache_dir, name) for name in os.listdir(self.cache_dir) if name.endswith('.pickle')]
+
+    def _read_disk(self, key):
+        if not self.cache_dir:
+            return None
+
+        path = self._disk_path(key)
+        if not os.path.exists(path):
+            return None
+
+        with open(path, 'rb') as f:
+            return f.read()
+
+    def _write_disk(self, key, testsuites):
+        if not self.cache_dir:
+            return
+
+        try:
+            content = pickle.dumps(testsuites, protocol=pickle.HIGHEST_PROTOCOL)
+        except (pickle.PicklingError, RecursionError) as e:
+            logging.warning('Failed to pickle the parsed testsuites into the parse cache, keep them in memory: %r', e)
+            return
+
+        if not os.path.exists(self.cache_dir):
+            os.makedirs(self.cache_dir)
+
+        fd, temp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(content)
+        os.replace(temp_path, self._disk_path(key))
+
+        paths = self._disk_files()
+        if len(paths) > self.max_disk_entries:
+            paths.sort(key=os.path.getmtime)
+            for path in paths[:len(paths) - self.max_disk_entries]:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
@@ -2,81 +2,143 @@
 # _*_ coding:utf-8 _*_
 import logging
 import sys
-from testcase2xmind.zentao2xmind import zentao_csv_file_to_xmind
-from xmind2testcase.zentao import xmind_to_zentao_csv_file
-from xmind2testcase.testlink import xmind_to_testlink_xml_file
-from xmind2testcase.utils import get_absolute_path, xmind_testcase_to_json_file
-from webtool.application import launch
+from xmind2testcase.log import setup_logging, parse_verbosity
 
-logging.basicConfig(level=logging.INFO,
-                    format='%(asctime)s  %(name)s  %(levelname)s  [%(module)s - %(funcName)s]: %(message)s',
-                    datefmt='%Y/%m/%d %H:%M:%S')
+# every subcommand imports only what it needs, e.g. a conversion never imports flask or the xmind library
 
 using_doc = """
     Xmind2Testcase is a tool to parse xmind file into testcase file, which will help you generate a testlink recognized
     xml file or a zentao recognized cvs file, then you can import it into testlink or zentao.
     
     Usage:
-     xmind2testcase [path_to_xmind_file] [-csv] [-xml] [-json]
+     xmind2testcase [path_to_xmind_file] [-csv] [-xml] [-json] [-json-compact] [-ndjson]
+     xmind2testcase batch [dir|glob|xmind_file]... [-csv] [-xml] [-json] [-ndjson] [-workers N] [-resume]
      xmind2testcase [webtool] [port_num]
+     every command also accepts -q (warnings only), -v (debug logs) or -vv (trace logs with the parsed data)
     
     Example:
      xmind2testcase /path/to/testcase.xmind        => output testcase.csv、testcase.xml、testcase.json
      xmind2testcase /path/to/testcase.xmind -csv   => output testcase.csv
      xmind2testcase /path/to/testcase.xmind -xml   => output testcase.xml
      xmind2testcase /path/to/testcase.xmind -json  => output testcase.json
-     xmind2testcase /path/to/testcase.csv -xmind   => output testcase.xmind
+     xmind2testcase /path/to/testcase.xmind -json-compact => output testcase.json without indentation
+     xmind2testcase /path/to/testcase.xmind -ndjson => output testcase.ndjson, one testcase per line
+     xmind2testcase /path/to/testcase.csv -xmind   => output testcase.xmind, grouped by the zentao modules
+     xmind2testcase /path/to/testcase.csv -xmind-zen => output testcase.xmind in the XMind Zen format
+     xmind2testcase batch /path/to/dir -workers 4  => convert all xmind files under the dir with 4 processes
+     xmind2testcase batch "/path/**/*.xmind" -resume => continue an interrupted batch, skip the converted files
      xmind2testcase webtool                        => launch the web testcase conversion tool locally: 127.0.0.1:5001
      xmind2testcase webtool 8000                   => launch the web testcase conversion tool locally: 127.0.0.1:8000
+     xmind2testcase /path/to/testcase.xmind -csv -q => output testcase.csv, only log the warnings and errors
     """
 
 
 def cli_main():
-    if len(sys.argv) > 1 and sys.argv[1].endswith('.xmind'):
-        xmind_file = sys.argv[1]
-        xmind_file = get_absolute_path(xmind_file)
-        logging.info('Start to convert XMind file: %s', xmind_file)
-
-        if len(sys.argv) == 3 and sys.argv[2] == '-json':
-            testlink_json_file = xmind_testcase_to_json_file(xmind_file)
-            logging.info('Convert XMind file to testcase json file successfully: %s', testlink_json_file)
-        elif len(sys.argv) == 3 and sys.argv[2] == '-xml':
-            testlink_xml_file = xmind_to_testlink_xml_file(xmind_file)
-            logging.info('Convert XMind file to testlink xml files successfully: %s', testlink_xml_file)
-        elif len(sys.argv) == 3 and sys.argv[2] == '-csv':
-            zentao_csv_file = xmind_to_zentao_csv_file(xmind_file)
-            logging.info('Convert XMind file to zentao csv file successfully: %s', zentao_csv_file)
-        else:
-            testlink_json_file = xmind_testcase_to_json_file(xmind_file)
-            testlink_xml_file = xmind_to_testlink_xml_file(xmind_file)
-            zentao_csv_file = xmind_to_zentao_csv_file(xmind_file)
-            logging.info('Convert XMind file successfully: \n'
-                         '1、 testcase json file(%s)\n'
-                         '2、 testlink xml file(%s)\n'
-                         '3、 zentao csv file(%s)',
-                         testlink_json_file,
-                         testlink_xml_file,
-                         zentao_csv_file)
-    elif len(sys.argv) > 1 and sys.argv[1] == 'webtool':
-        if len(sys.argv) == 3:
+    argv, log_level = parse_verbosity(sys.argv)
+    if len(argv) > 1 and argv[1].endswith('.xmind'):
+        setup_logging(log_level)
+        convert_main(argv[1], argv[2:])
+    elif len(argv) > 2 and argv[1] == 'batch':
+        setup_logging(log_level)
+        batch_main(argv[2:])
+    elif len(argv) > 1 and argv[1] == 'webtool':
+        from webtool.application import launch  # the webtool sets up its own console and file logging
+
+        if len(argv) == 3:
             try:
-                port = int(sys.argv[2])
-                launch(port=port)
+                port = int(argv[2])
+                launch(port=port, log_level=log_level)
             except ValueError:
-                launch()
+                launch(log_level=log_level)
         else:
-            launch()
-    elif len(sys.argv) > 1 and sys.argv[1].endswith('.csv'):
-        zentao_csv_file = sys.argv[1]
-        zentao_csv_file = get_absolute_path(zentao_csv_file)
-        logging.info('Start to convert zentao_csv file: %s', zentao_csv_file)
-        if len(sys.argv) == 3 and sys.argv[2] == '-xmind':
-            csv_to_xmind_file = zentao_csv_file_to_xmind(zentao_csv_file)
-            logging.info('Convert csv_to_xmind file to xmind file successfully: %s', csv_to_xmind_file)
-
+            launch(log_level=log_level)
+    elif len(argv) > 1 and argv[1].endswith('.csv'):
+        setup_logging(log_level)
+        csv_main(argv[1], argv[2:])
     else:
         print(using_doc)
 
 
+def convert_main(xmind_file, args):
+    """xmind2testcase <xmind_file> [-csv] [-xml] [-json] [-json-compact] [-ndjson]"""
+    from xmind2testcase.session import ConversionSession
+    from xmind2testcase.utils import get_absolute_path, JSON_COMPACT
+
+    xmind_file = get_absolute_path(xmind_file)
+    option = args[0] if len(args) == 1 else None
+    logging.info('Start to convert XMind file: %s', xmind_file)
+
+    session = ConversionSession(xmind_file)
+
+    if option == '-json':
+        testlink_json_file = session.to_testcase_json_file()
+        logging.info('Convert XMind file to testcase json file successfully: %s', testlink_json_file)
+    elif option == '-json-compact':
+        testlink_json_file = session.to_testcase_json_file(JSON_COMPACT)
+        logging.info('Convert XMind file to testcase json file successfully: %s', testlink_json_file)
+    elif option == '-ndjson':
+        testcase_ndjson_file = session.to_testcase_ndjson_file()
+        logging.info('Convert XMind file to testcase ndjson file successfully: %s', testcase_ndjson_file)
+    elif option == '-xml':
+        testlink_xml_file = session.to_testlink_xml_file()
+        logging.info('Convert XMind file to testlink xml files successfully: %s', testlink_xml_file)
+    elif option == '-csv':
+        zentao_csv_file = session.to_zentao_csv_file()
+        logging.info('Convert XMind file to zentao csv file successfully: %s', zentao_csv_file)
+    else:
+        output_files = session.convert()
+        logging.info('Convert XMind file successfully: \n'
+                     '1、 testcase json file(%s)\n'
+                     '2、 testlink xml file(%s)\n'
+                     '3、 zentao csv file(%s)',
+                     output_files['json'],
+                     output_files['xml'],
+                     output_files['csv'])
+
+
+def batch_main(args):
+    """xmind2testcase batch <dir|glob|file>... [-csv] [-xml] [-json] [-ndjson] [-workers N] [-resume]"""
+    from xmind2testcase.batch import batch_convert, format_summary
+    from xmind2testcase.session import ALL_FORMATS, FORMAT_CSV, FORMAT_XML, FORMAT_JSON, FORMAT_NDJSON
+
+    paths = []
+    formats = []
+    workers = None
+    resume = False
+    format_options = {'-csv': FORMAT_CSV, '-xml': FORMAT_XML, '-json': FORMAT_JSON, '-ndjson': FORMAT_NDJSON}
+
+    args = iter(args)
+    for arg in args:
+        if arg in format_options:
+            formats.append(format_options[arg])
+        elif arg == '-workers':
+            try:
+                workers = int(next(args))
+            except (StopIteration, ValueError):
+                print(using_doc)
+                sys.exit(2)
+        elif arg == '-resume':
+            resume = True
+        else:
+            paths.append(arg)
+
+    results = batch_convert(paths, formats or ALL_FORMATS, workers=workers, resume=resume)
+    print(format_summary(results))
+    if any(error for _, _, error in results):
+        sys.exit(1)
+
+
+def csv_main(zentao_csv_file, args):
+    """xmind2testcase <zentao_csv_file> -xmind|-xmind-zen"""
+    from testcase2xmind.zentao2xmind import zentao_csv_file_to_xmind
+    from xmind2testcase.utils import get_absolute_path
+
+    zentao_csv_file = get_absolute_path(zentao_csv_file)
+    logging.info('Start to convert zentao_csv file: %s', zentao_csv_file)
+    if args in (['-xmind'], ['-xmind-zen']):
+        csv_to_xmind_file = zentao_csv_file_to_xmind(zentao_csv_file, zen=args[0] == '-xmind-zen')
+        logging.info('Convert csv_to_xmind file to xmind file successfully: %s', csv_to_xmind_file)
+
+
 if __name__ == '__main__':
     cli_main()
@@ -0,0 +1,219 @@
+#!/usr/bin/env python
+# _*_ coding:utf-8 _*_
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor, wait as wait_futures
+from xmind2testcase.cache import file_sha256
+from xmind2testcase.session import ConversionSession, FORMAT_XML, FORMAT_CSV
+
+"""
+A local queue of background conversion jobs, e.g. the webtool converts an uploaded XMind file to every download
+format as soon as it is saved, and a download only waits for the job instead of converting it again.
+
+Jobs run in a bounded thread pool of this process. There is at most one job of a XMind file at a time, a job
+is submitted again only if the file has changed or its output files have been removed. With an
+`xmind2testcase.artifacts.ArtifactStore`, the output files are written into the store instead of next to the
+XMind file, and the same content is never converted twice.
+"""
+
+STATUS_PENDING = 'pending'
+STATUS_RUNNING = 'running'
+STATUS_DONE = 'done'
+STATUS_FAILED = 'failed'
+
+DEFAULT_FORMATS = (FORMAT_XML, FORMAT_CSV)
+
+
+class ConversionJob(object):
+
+    def __init__(self, xmind_file, formats, signature, sha256=None):
+        """
+        ConversionJob
+        :param xmind_file: the absolute path of the XMind file
+        :param formats: the formats to convert to, see `xmind2testcase.session.ConversionSession.convert`
+        :param signature: (size, mtime) of the XMind file when the job is submitted
+        :param sha256: the sha256 of the XMind file content if it is known, otherwise it is computed by the job
+        """
+        self.xmind_file = xmind_file
+        self.formats = tuple(formats)
+        self.signature = signature
+        self.sha256 = sha256
+        self.status = STATUS_PENDING
+        self.outputs = {}
+        self.artifacts = {}  # format => `xmind2testcase.artifacts.Artifact` if the job writes into a store
+        self.error = None
+        self.submitted_on = time.time()
+        self.started_on = None
+        self.finished_on = None
+        self.future = None
+        self.session = None  # the `ConversionSession` of the job until it finishes, see `ConversionJobQueue.get_session`
+
+    @property
+    def finished(self):
+        return self.status in (STATUS_DONE, STATUS_FAILED)
+
+    def result(self, timeout=None):
+        """Wait for the job and return its {format: output file}, raise the error of a failed job"""
+        return self.future.result(timeout)
+
+    def wait(self, timeout=None):
+        """Wait for the job to finish without raising its error, return whether it has finished"""
+        wait_futures([self.future], timeout)
+        return self.finished
+
+    def is_stale(self):
+        """Whether the XMind file has changed, or the output files of a finished job have been removed"""
+        if _file_signature(self.xmind_file) != self.signature:
+            return True
+        if self.status == STATUS_DONE:
+            return not all(os.path.exists(path) for path in self.outputs.values() if path)
+        return self.status == STATUS_FAILED
+
+    def to_dict(self):
+        return {'file': os.path.basename(self.xmind_file),
+                'status': self.status,
+                'formats': list(self.formats),
+                'outputs': {fmt: os.path.basename(path) for fmt, path in self.outputs.items() if path},
+                'etags': {fmt: artifact.etag for fmt, artifact in self.artifacts.items()},
+                'error': self.error,
+                'submitted_on': self.submitted_on,
+                'started_on': self.started_on,
+                'finished_on': self.finished_on}
+
+
+class ConversionJobQueue(object):
+
+    def __init__(self, max_workers=2, max_jobs=256, cache=None, formats=DEFAULT_FORMATS, store=None):
+        """
+        ConversionJobQueue
+        :param max_workers: max number of XMind files converted at the same time
+        :param max_jobs: max number of jobs remembered, the oldest finished jobs are forgotten first
+        :param cache: an optional `xmind2testcase.cache.ParseCache` shared with the other conversion sessions
+        :param formats: the formats every XMind file is converted to
+        :param store: an optional `xmind2testcase.artifacts.ArtifactStore` to write the output files into
+        """
+        self.max_jobs = max_jobs
+        self.cache = cache
+        self.formats = tuple(formats)
+        self.store = store
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='xmind2testcase-job')
+        self._jobs = OrderedDict()  # absolute XMind file path => the latest job
+        self._lock = threading.Lock()
+
+    def submit(self, xmind_file, sha256=None):
+        """Queue a conversion job of the XMind file, or return its existing job if it is still up to date
+
+        :param sha256: the sha256 of the XMind file content if it is known, e.g. taken when it was uploaded
+        """
+        xmind_file = os.path.abspath(xmind_file)
+        with self._lock:
+            job = self._jobs.get(xmind_file)
+            if job is not None and not job.is_stale():
+                return job
+
+            job = ConversionJob(xmind_file, self.formats, _file_signature(xmind_file), sha256)
+            job.session = ConversionSession(xmind_file, self.cache, sha256=sha256)
+            job.future = self._executor.submit(self._run, job)
+            self._jobs[xmind_file] = job
+            self._jobs.move_to_end(xmind_file)
+            self._forget_finished_jobs()
+            logging.info('Queued a conversion job of XMind file(%s): %s', xmind_file, ', '.join(job.formats))
+            return job
+
+    def get(self, xmind_file):
+        """Return the latest job of the XMind file, or None if there is no job of it"""
+        with self._lock:
+            return self._jobs.get(os.path.abspath(xmind_file))
+
+    def get_session(self, xmind_file):
+        """Return a `ConversionSession` of the XMind file which shares the parsed testsuites with its job
+
+        While the job is parsing the file, reading `session.testsuites` waits for the parse only, not for the output
+        files to be written. A finished job has released its session, the testsuites are then read from the cache.
+        """
+        xmind_file = os.path.abspath(xmind_file)
+        job = self.get(xmind_file)
+        if job is None or job.is_stale():
+            return ConversionSession(xmind_file, self.cache)
+
+        session = job.session
+        if session is None:
+            session = ConversionSession(xmind_file, self.cache, sha256=job.sha256)
+        return session
+
+    def get_output_file(self, xmind_file, fmt, timeout=None):
+        """Return the output file of the XMind file in a format, waiting for its job (or a new job) to finish"""
+        job = self.submit(xmind_file)
+        if fmt not in job.formats:
+            raise ValueError('Unsupported conversion format of the job queue: {}'.format(fmt))
+        return job.result(timeout).get(fmt)
+
+    def get_artifact(self, xmind_file, fmt, timeout=None):
+        """Return the `xmind2testcase.artifacts.Artifact` of the XMind file in a format, see `get_output_file`"""
+        if self.store is None:
+            raise ValueError('The job queue has no artifact store')
+
+        job = self.submit(xmind_file)
+        if fmt not in job.formats:
+            raise ValueError('Unsupported conversion format of the job queue: {}'.format(fmt))
+        job.result(timeout)
+        return job.artifacts[fmt]
+
+    def forget(self, xmind_file):
+        """Forget the job of a removed XMind file, a job still waiting in the queue is cancelled"""
+        with self._lock:
+            job = self._jobs.pop(os.path.abspath(xmind_file), None)
+        if job is not None:
+            job.future.cancel()
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
+
+    def _run(self, job):
+        job.status = STATUS_RUNNING
+        job.started_on = time.time()
+        try:
+            session = job.session
+            if job.sha256 is None and (self.cache is not None or self.store is not None):
+                job.sha256 = session.sha256 = file_sha256(job.xmind_file)  # hashed once for the cache and artifacts
+            if self.store is None:
+                job.outputs = session.convert(job.formats)
+            else:
+                # the file is only parsed if one of its artifacts is not stored yet
+                for fmt in job.formats:
+                    job.artifacts[fmt] = self.store.get_or_create(job.xmind_file, fmt, partial(session.write, fmt),
+                                                                  session.options, job.sha256)
+                job.outputs = {fmt: artifact.path for fmt, artifact in job.artifacts.items()}
+        except Exception as e:
+            job.status = STATUS_FAILED
+            job.error = str(e)
+            if os.path.exists(job.xmind_file):
+                logging.exception('Failed to convert XMind file(%s) in the background', job.xmind_file)
+            else:
+                logging.warning('XMind file(%s) was removed before its conversion finished', job.xmind_file)
+            raise
+        else:
+            job.status = STATUS_DONE
+            return job.outputs
+        finally:
+            job.finished_on = time.time()
+            job.session = None  # the parsed testsuites are kept by the parse cache, not by the remembered jobs
+
+    def _forget_finished_jobs(self):
+        for xmind_file in list(self._jobs):
+            if len(self._jobs) <= self.max_jobs:
+                break
+            if self._jobs[xmind_file].finished:
+                del self._jobs[xmind_file]
+
+
+def _file_signature(path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_size, stat.st_mtime
@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+# _*_ coding:utf-8 _*_
+import logging
+
+"""
+Logging setup of the entry points (the command line and the webtool)
+
+Importing a xmind2testcase module never adds a handler or changes a level, an application embedding it keeps its
+own logging configuration. The entry points call `setup_logging` once they know what they are going to do.
+
+The whole parsed testsuites, testcases and steps are only dumped at the TRACE level, which is below DEBUG and
+has to be turned on explicitly (e.g. `-vv` of the command line). They are built only if TRACE is enabled.
+"""
+
+TRACE = 5
+logging.addLevelName(TRACE, 'TRACE')
+
+VERBOSITY_OPTIONS = {'-q': logging.WARNING, '-v': logging.DEBUG, '-vv': TRACE}
+
+LOG_FORMAT = '%(asctime)s  %(name)s  %(levelname)s  [%(module)s - %(funcName)s]: %(message)s'
+LOG_DATE_FORMAT = '%Y/%m/%d %H:%M:%S'
+
+_handlers = {}  # (logger name, log file or None for the console) => the handler added by setup_logging
+
+
+def setup_logging(level=logging.INFO, log_file=None, file_level=logging.DEBUG, logger_names=('',)):
+    """Log to the console, and to log_file if it is given, calling it again doesn't add the handlers twice
+
+    :param level: the level of the console handler
+    :param log_file: an optional log file, it is opened when the first record is written
+    :param file_level: the level of the log file handler
+    :param logger_names: the loggers to set up, '' is the root logger
+    """
+    formatter = logging.Formatter(LOG_FORMAT, LOG_DATE_FORMAT)
+    for logger_name in logger_names:
+        logger = logging.getLogger(logger_name)
+        levels = [level]
+        _add_handler(logger, None, level, formatter)
+        if log_file:
+            _add_handler(logger, log_file, file_level, formatter)
+            levels.append(file_level)
+        logger.setLevel(min(levels))
+
+
+def is_trace_enabled():
+    """Whether the TRACE records are handled, check it before building a payload, e.g. `testcase.to_dict()`"""
+    return logging.root.isEnabledFor(TRACE)
+
+
+def trace(msg, *args):
+    logging.log(TRACE, msg, *args)
+
+
+def parse_verbosity(args, default=logging.INFO):
+    """Take the verbosity options out of the command line arguments
+
+    :param args: the arguments, -q: warnings only, -v: debug, -vv: trace (the parsed data is dumped as well)
+    :return: (the other arguments, the log level of the last verbosity option or the default)
+    """
+    level = default
+    other_args = []
+    for arg in args:
+        if arg in VERBOSITY_OPTIONS:
+            level = VERBOSITY_OPTIONS[arg]
+        else:
+            other_args.append(arg)
+    return other_args, level
+
+
+def _add_handler(logger, log_file, level, formatter):
+    handler = _handlers.get((logger.name, log_file))
+    if handler is None:
+        handler = logging.FileHandler(log_file, encoding='UTF-8', delay=True) if log_file else logging.StreamHandler()
+        handler.setFormatter(formatter)
+        logger.addHandler(handler)
+        _handlers[(logger.name, log_file)] = handler
+    handler.setLevel(level)
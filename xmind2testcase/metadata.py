@@ -4,11 +4,39 @@
 """
 testlink.testlink
 """
+from collections.abc import Mapping
+from enum import IntEnum
+
+
+class _IntEnum(IntEnum):
+    """A small integer enum that is displayed and serialized as the plain integer"""
+    __str__ = int.__repr__
+    __format__ = int.__format__
+
+
+class TestResult(_IntEnum):
+    NON_EXECUTION = 0
+    PASS = 1
+    FAILED = 2
+    BLOCKED = 3
+    SKIPPED = 4
+
+
+class Importance(_IntEnum):
+    HIGH = 1
+    MIDDLE = 2
+    LOW = 3
+
+
+class ExecutionType(_IntEnum):
+    MANUAL = 1
+    AUTOMATE = 2
 
 
 class TestSuite(object):
+    __slots__ = ('name', 'details', 'testcase_list', 'sub_suites', 'statistics', 'stats')
 
-    def __init__(self, name='', details='', testcase_list=None, sub_suites=None, statistics=None):
+    def __init__(self, name='', details='', testcase_list=None, sub_suites=None, statistics=None, stats=None):
         """
         TestSuite
         :param name: test suite name
@@ -16,12 +44,18 @@ class TestSuite(object):
         :param testcase_list: test case list
         :param sub_suites: sub test suite list
         :param statistics: testsuite statistics info {'case_num': 0, 'non_execution': 0, 'pass': 0, 'failed': 0, 'blocked': 0, 'skipped': 0}
+        :param stats: the `TestStatistics` of this testsuite, counted while it is parsed
         """
         self.name = name
         self.details = details
         self.testcase_list = testcase_list
         self.sub_suites = sub_suites
         self.statistics = statistics
+        self.stats = stats
+
+    def view(self):
+        """A read-only mapping of this testsuite, the same keys as `to_dict()` but nothing is copied"""
+        return TestSuiteView(self)
 
     def to_dict(self):
         data = {
@@ -46,8 +80,10 @@ class TestSuite(object):
 
 
 class TestCase(object):
+    __slots__ = ('name', 'version', 'summary', 'preconditions', 'execution_type', 'importance',
+                 'estimated_exec_duration', 'status', 'result', 'steps')
 
-    def __init__(self, name='', version=1, summary='', preconditions='', execution_type=1, importance=2, estimated_exec_duration=3, status=7, result=0, steps=None):
+    def __init__(self, name='', version=1, summary='', preconditions='', execution_type=ExecutionType.MANUAL, importance=Importance.MIDDLE, estimated_exec_duration=3, status=7, result=TestResult.NON_EXECUTION, steps=None):
         """
         TestCase
         :param name: test case name
@@ -72,6 +108,10 @@ class TestCase(object):
         self.result = result
         self.steps = steps
 
+    def view(self, **extra):
+        """A read-only mapping of this testcase, the same keys as `to_dict()` plus the extra items"""
+        return TestCaseView(self, **extra)
+
     def to_dict(self):
         data = {
             'name': self.name,
@@ -94,8 +134,9 @@ class TestCase(object):
 
 
 class TestStep(object):
+    __slots__ = ('step_number', 'actions', 'expectedresults', 'execution_type', 'result')
 
-    def __init__(self, step_number=1, actions='', expectedresults='', execution_type=1, result=0):
+    def __init__(self, step_number=1, actions='', expectedresults='', execution_type=ExecutionType.MANUAL, result=TestResult.NON_EXECUTION):
         """
         TestStep
         :param step_number: test step number
@@ -110,6 +151,10 @@ class TestStep(object):
         self.execution_type = execution_type  # TODO(devin): get execution type content
         self.result = result
 
+    def view(self):
+        """A read-only mapping of this teststep, the same keys as `to_dict()`"""
+        return TestStepView(self)
+
     def to_dict(self):
         data = {
             'step_number': self.step_number,
@@ -121,3 +166,207 @@ class TestStep(object):
 
         return data
 
+
+class TestStatistics(object):
+    """The number of testcases of a topic by result, importance and execution type
+
+    A sheet, a testsuite or an intermediate topic has one, its children are the statistics of its sub testsuites
+    or intermediate subtopics, and its counts include theirs. The tree is as deep as the map, so it is only walked
+    with an explicit stack, and it is pickled as a flat list of nodes.
+    """
+    __slots__ = ('name', 'case_num', 'results', 'importance', 'execution_types', 'children')
+
+    def __init__(self, name=''):
+        self.name = name
+        self.case_num = 0
+        self.results = {}
+        self.importance = {}
+        self.execution_types = {}
+        self.children = []
+
+    def count(self, case):
+        """Count a `TestCase` directly under this topic"""
+        self.case_num += 1
+        self.results[case.result] = self.results.get(case.result, 0) + 1
+        self.importance[case.importance] = self.importance.get(case.importance, 0) + 1
+        self.execution_types[case.execution_type] = self.execution_types.get(case.execution_type, 0) + 1
+
+    def add(self, other):
+        """Add the counts of other, e.g. a finished subtopic, to this one"""
+        self.case_num += other.case_num
+        for counts, other_counts in ((self.results, other.results),
+                                     (self.importance, other.importance),
+                                     (self.execution_types, other.execution_types)):
+            for key, value in other_counts.items():
+                counts[key] = counts.get(key, 0) + value
+
+    def add_child(self, child):
+        self.children.append(child)
+        self.add(child)
+
+    def extend(self, other):
+        """Add the counts and the children of other, e.g. the statistics of a branch, to this one"""
+        self.children.extend(other.children)
+        self.add(other)
+
+    def iter_descendants(self):
+        """Iterate (level, statistics) of the descendants in pre-order, the children of this one are at level 1"""
+        stack = [(1, child) for child in reversed(self.children)]
+        while stack:
+            level, stats = stack.pop()
+            yield level, stats
+            stack.extend((level + 1, child) for child in reversed(stats.children))
+
+    def result_summary(self):
+        """The legacy `TestSuite.statistics` dict"""
+        return {'case_num': self.case_num,
+                'non_execution': self.results.get(TestResult.NON_EXECUTION, 0),
+                'pass': self.results.get(TestResult.PASS, 0),
+                'failed': self.results.get(TestResult.FAILED, 0),
+                'blocked': self.results.get(TestResult.BLOCKED, 0),
+                'skipped': self.results.get(TestResult.SKIPPED, 0)}
+
+    def to_dict(self):
+        """The counts of this topic, and its descendants flattened in pre-order into 'topics'
+
+        A topic's 'level' is 1 for the children of this one, and its 'parent' is the index of its parent topic in
+        'topics' (None for the children of this one), so the tree can be rebuilt at any depth.
+        """
+        data = self._counts_dict()
+        data['topics'] = topics = []
+        parents = []  # the index of the last topic of every level
+        for level, stats in self.iter_descendants():
+            del parents[level - 1:]
+            topic = stats._counts_dict()
+            topic['level'] = level
+            topic['parent'] = parents[-1] if parents else None
+            parents.append(len(topics))
+            topics.append(topic)
+        return data
+
+    def _counts_dict(self):
+        return {'name': self.name,
+                'case_num': self.case_num,
+                'result': _named_counts(self.results, TestResult),
+                'importance': _named_counts(self.importance, Importance),
+                'execution_type': _named_counts(self.execution_types, ExecutionType)}
+
+    def __getstate__(self):
+        nodes = []  # (name, case_num, results, importance, execution_types, number of children) in pre-order
+        stack = [self]
+        while stack:
+            stats = stack.pop()
+            nodes.append((stats.name, stats.case_num, stats.results, stats.importance, stats.execution_types,
+                          len(stats.children)))
+            stack.extend(reversed(stats.children))
+        return nodes
+
+    def __setstate__(self, nodes):
+        stack = []  # [statistics, number of children still to be read]
+        for index, (name, case_num, results, importance, execution_types, child_count) in enumerate(nodes):
+            stats = self if index == 0 else TestStatistics.__new__(TestStatistics)
+            stats.name, stats.case_num = name, case_num
+            stats.results, stats.importance, stats.execution_types = results, importance, execution_types
+            stats.children = []
+            while stack and not stack[-1][1]:
+                stack.pop()
+            if stack:
+                stack[-1][0].children.append(stats)
+                stack[-1][1] -= 1
+            stack.append([stats, child_count])
+
+
+def _named_counts(counts, enum):
+    """{value: count} => {member name: count} of every enum member, other values (e.g. priority 4) are kept"""
+    data = {member.name.lower(): counts.get(member, 0) for member in enum}
+    for key in sorted(key for key in counts if key not in enum._value2member_map_):
+        data[str(key)] = counts[key]
+    return data
+
+
+class ModelView(Mapping):
+    """A lazy, read-only mapping over a TestSuite/TestCase/TestStep
+
+    Values are read from the object when they are accessed, nested testcases and steps are views too,
+    `to_dict()` materializes the plain dict only when it is really needed (e.g. for json).
+    """
+    __slots__ = ('_model', '_extra')
+    fields = ()
+
+    def __init__(self, model, **extra):
+        self._model = model
+        self._extra = extra
+
+    def __getitem__(self, key):
+        if key in self._extra:
+            return self._extra[key]
+        if key in self.fields and self._has_field(key):
+            return self._get_field(key)
+        raise KeyError(key)
+
+    def __iter__(self):
+        for key in self.fields:
+            if self._has_field(key):
+                yield key
+        for key in self._extra:
+            yield key
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __getattr__(self, key):
+        # allow `view.name` as well as `view['name']`, e.g. in templates
+        if key.startswith('_'):
+            raise AttributeError(key)
+        try:
+            return self[key]
+        except KeyError:
+            raise AttributeError(key)
+
+    def __repr__(self):
+        return '<{} {!r}>'.format(self.__class__.__name__, self.to_dict())
+
+    def _has_field(self, key):
+        return True
+
+    def _get_field(self, key):
+        return getattr(self._model, key)
+
+    def to_dict(self):
+        data = {}
+        for key, value in self.items():
+            if isinstance(value, list):
+                value = [item.to_dict() if isinstance(item, ModelView) else item for item in value]
+            data[key] = value
+        return data
+
+
+class TestSuiteView(ModelView):
+    __slots__ = ()
+    fields = ('name', 'details', 'testcase_list', 'sub_suites', 'statistics')
+
+    def _has_field(self, key):
+        return key != 'statistics' or bool(self._model.statistics)
+
+    def _get_field(self, key):
+        if key == 'testcase_list':
+            return [case.view() for case in self._model.testcase_list or []]
+        if key == 'sub_suites':
+            return [suite.view() for suite in self._model.sub_suites or []]
+        return getattr(self._model, key)
+
+
+class TestCaseView(ModelView):
+    __slots__ = ()
+    fields = ('name', 'version', 'summary', 'preconditions', 'execution_type', 'importance',
+              'estimated_exec_duration', 'status', 'result', 'steps')
+
+    def _get_field(self, key):
+        if key == 'steps':
+            return [step.view() for step in self._model.steps or []]
+        return getattr(self._model, key)
+
+
+class TestStepView(ModelView):
+    __slots__ = ()
+    fields = ('step_number', 'actions', 'expectedresults', 'execution_type', 'result')
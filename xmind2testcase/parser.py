@@ -2,279 +2,524 @@
 # _*_ coding:utf-8 _*_
 
 import logging
-from xmind2testcase.metadata import TestSuite, TestCase, TestStep
+import sys
+from itertools import repeat
+from xmind2testcase.metadata import TestSuite, TestCase, TestStep, TestResult, Importance, ExecutionType, \
+    TestStatistics
+from xmind2testcase.log import is_trace_enabled, trace
+from xmind2testcase.vocabulary import DEFAULT_VOCABULARY
 
 config = {'sep': ' ',
           'valid_sep': '&>+/-',
           'precondition_sep': '\n----\n',
           'summary_sep': '\n----\n',
-          'ignore_char': '#!！'
+          'ignore_char': '#!！',
+          'vocabulary': DEFAULT_VOCABULARY
           }
 
+# the prefix of a topic without any ancestor: (title, preconditions, summary, execution type)
+EMPTY_PREFIX = ('', '', '', None)
+
+# a workbook with less topics is parsed sequentially even in the parallel mode, the pool startup costs more
+PARALLEL_MIN_TOPICS = 5000
+
+
+class ParserOptions(object):
+    """Per-call parser options, the defaults are taken from the module-level `config`
+
+    The options are passed down through the parser and the writers instead of the shared `config`, so several
+    XMind files can be parsed concurrently. Treat an instance as read-only, use `replace()` to derive a new one,
+    e.g. the title separator detected from each sheet's root title.
+    """
+    __slots__ = ('sep', 'valid_sep', 'precondition_sep', 'summary_sep', 'ignore_char', 'vocabulary')
+
+    def __init__(self, **options):
+        unknown = set(options) - set(self.__slots__)
+        if unknown:
+            raise TypeError('Unknown parser options: {}'.format(', '.join(sorted(unknown))))
+
+        for key in self.__slots__:
+            setattr(self, key, options[key] if key in options else config[key])
+
+    def replace(self, **changes):
+        """Return a copy of the options with some of them changed"""
+        options = self.to_dict()
+        options.update(changes)
+        return ParserOptions(**options)
+
+    @property
+    def title_separator(self):
+        """when separator is not blank, will add space around separator, e.g. '/' will be changed to ' / '"""
+        return self.sep if self.sep == ' ' else ' {} '.format(self.sep)
+
+    def to_dict(self):
+        return {key: getattr(self, key) for key in self.__slots__}
+
+    def __eq__(self, other):
+        return isinstance(other, ParserOptions) and self.to_dict() == other.to_dict()
+
+    def __repr__(self):
+        return 'ParserOptions({!r})'.format(self.to_dict())
+
+
+def get_options(options=None):
+    """Return the given options, or the default options made from the current `config`"""
+    return options if options is not None else ParserOptions()
+
+
+def xmind_to_testsuites(xmind_content_dict, options=None, max_workers=None, executor=None, subtree_cache=None):
+    """convert xmind file to `xmind2testcase.metadata.TestSuite` list
+
+    :param xmind_content_dict: the sheet dicts of a XMind file
+    :param options: an optional `ParserOptions`, default to the options made from `config`
+    :param max_workers: parse the sheets concurrently in a process pool of this size if it is greater than 1
+    :param executor: an existing `concurrent.futures.Executor` to parse the sheets concurrently, instead of a new pool
+    :param subtree_cache: an optional `xmind2testcase.cache.SubtreeCache`, the unchanged subtrees of a previously
+                          parsed version are reused instead of parsed again. Only used when the sheets are parsed in
+                          this process
+    """
+    options = get_options(options)
+
+    if executor is not None or (max_workers and max_workers > 1):
+        sheets = list(xmind_content_dict)
+        if _should_parse_in_parallel(sheets):
+            return _parallel_sheets_to_suites(sheets, options, max_workers, executor)
+        logging.debug('the workbook is too small to be parsed in parallel, parse its sheets one by one')
+        xmind_content_dict = sheets
 
-def xmind_to_testsuites(xmind_content_dict):
-    """convert xmind file to `xmind2testcase.metadata.TestSuite` list"""
     suites = [] # 创建一个空列表suites，用于存储将要生成的TestSuite对象。
 
     for sheet in xmind_content_dict: # sheet在这里代表xmind文件中的画布，使用for循环遍历列表中的字典
+        suite = parse_sheet(sheet, options, subtree_cache) # 将当前画布的根主题数据转换为测试套件对象，空白画布返回None
+        if suite is not None:
+            suites.append(suite) # 将转换得到的测试套件对象添加到suites列表中
+
+    return suites
+
+
+def parse_sheet(sheet, options=None, subtree_cache=None):
+    """convert a sheet dict to a root `TestSuite`, return None if it is a blank sheet"""
+    options = get_options(options)
+    logging.debug('start to parse a sheet: %s', sheet['title'])
+    root_topic = sheet['topic'] # 从当前Sheet的字典中获取根Topic（根主题），根Topic是整个Sheet的顶层主题。
+    sub_topics = root_topic.get('topics', []) # 使用get()方法从根主题的字典中获取'topics'键对应的值（子主题列表）。如果'topics'键不存在或者没有值，即根主题没有子主题，get()方法将返回一个空列表[]，表示当前Sheet中没有包含任何测试用例信息。
+
+    if not sub_topics: # 如果sub_topics为空，即该Sheet没有包含测试用例信息，将记录一个警告信息到日志，并继续下一个Sheet的解析。
+        logging.debug('This is a blank sheet(%s), should have at least 1 sub topic(test suite)', sheet['title'])
+        return None
+    suite = sheet_to_suite(root_topic, options, subtree_cache) # 将当前画布的根主题数据转换为测试套件对象，空的主题或被忽略的主题在遍历时过滤
+    # suite.sheet_name = sheet['title']  # root testsuite has a sheet_name attribute
+    logging.debug('sheet(%s) parsing complete: %s testsuites', sheet['title'], len(suite.sub_suites))
+    if is_trace_enabled():
+        trace('sheet(%s) parsed: %s', sheet['title'], suite.to_dict())
+    return suite
+
+
+def _should_parse_in_parallel(sheets):
+    """Only a workbook with several non-blank sheets and enough topics is worth the process pool startup"""
+    sheets = [sheet for sheet in sheets if sheet['topic'].get('topics')]
+    if len(sheets) < 2:
+        return False
+
+    topic_count = 0
+    stack = [sheet['topic'] for sheet in sheets]
+    while stack:
+        topic = stack.pop()
+        topic_count += 1
+        if topic_count >= PARALLEL_MIN_TOPICS:
+            return True
+        stack.extend(topic.get('topics', []))
+    return False
+
+
+def _parallel_sheets_to_suites(sheets, options, max_workers=None, executor=None):
+    """Parse the sheets in worker processes, the testsuites are merged back in sheet order"""
+    logging.debug('start to parse %s sheets in parallel', len(sheets))
+    if executor is None:
+        from concurrent.futures import ProcessPoolExecutor  # multiprocessing is only imported for a large workbook
+        max_workers = min(max_workers, len(sheets)) if max_workers else None
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            suites = list(executor.map(parse_sheet, sheets, repeat(options)))
+    else:
+        suites = list(executor.map(parse_sheet, sheets, repeat(options)))
+
+    return [suite for suite in suites if suite is not None]
+
+
+def iter_testcases(xmind_content_dict, options=None):
+    """Parse xmind sheets and yield (product name, suite name, `TestCase`) one by one without keeping any TestSuite"""
+    options = get_options(options)
+    for sheet in xmind_content_dict:
         logging.debug('start to parse a sheet: %s', sheet['title'])
-        root_topic = sheet['topic'] # 从当前Sheet的字典中获取根Topic（根主题），根Topic是整个Sheet的顶层主题。
-        sub_topics = root_topic.get('topics', []) # 使用get()方法从根主题的字典中获取'topics'键对应的值（子主题列表）。如果'topics'键不存在或者没有值，即根主题没有子主题，get()方法将返回一个空列表[]，表示当前Sheet中没有包含任何测试用例信息。
+        root_topic = sheet['topic']
+        sub_topics = root_topic.get('topics', [])
 
-        if sub_topics: # 检查sub_topics是否非空，即该Sheet是否包含测试用例信息。
-            root_topic['topics'] = filter_empty_or_ignore_topic(sub_topics) # 对子主题列表进行过滤和处理，去除空的主题或被忽略的主题。
-        else: # 如果sub_topics为空，即该Sheet没有包含测试用例信息，将记录一个警告信息到日志，并继续下一个Sheet的解析。
+        if not sub_topics:
             logging.debug('This is a blank sheet(%s), should have at least 1 sub topic(test suite)', sheet['title'])
             continue
-        suite = sheet_to_suite(root_topic) # 将当前画布的根主题数据转换为测试套件对象
-        # suite.sheet_name = sheet['title']  # root testsuite has a sheet_name attribute
-        logging.debug('sheet(%s) parsing complete: %s', sheet['title'], suite.to_dict())
-        suites.append(suite) # 将转换得到的测试套件对象添加到suites列表中
 
-    return suites
+        product, sheet_options = parse_root_title(root_topic['title'], options)
+        for suite_dict in filter_empty_or_ignore_children(sub_topics, options):
+            for cases_dict in filter_empty_or_ignore_children(suite_dict.get('topics', []), options):
+                for case in recurse_parse_testcase(cases_dict, options=sheet_options):
+                    yield product, suite_dict['title'], case
 
 
-def filter_empty_or_ignore_topic(topics):
-    """filter blank or start with config.ignore_char topic"""
-    # result = [...]：这是将新列表的结果存储在名为 result 的变量中。
-    result = [topic for topic in topics if not(  # [topic for topic in topics]：这部分是一个列表解析，它遍历名为 topics 的列表中的每个元素（在这种情况下，每个元素都是一个主题），然后将它们包含在新的列表中。第一个topic：这是一个占位符变量，它代表在遍历 topics 列表时的每个元素。for topic in topics：这是一个循环语句，它遍历名为 topics 的列表中的每个元素，并将每个元素依次赋给占位符变量 topic。
-            topic['title'] is None or # 这部分检查主题的标题是否为 None（表示没有标题）。
-            topic['title'].strip() == '' or # 这部分检查主题的标题是否是空字符串，通过使用 .strip() 方法来删除标题中的额外空格并检查是否为空。
-            topic['title'][0] in config['ignore_char'])] # 这部分检查主题的标题是否以 config 中定义的字符列表中的任何字符开头，这样的主题会被忽略。
+def filter_empty_or_ignore_topic(topics, options=None):
+    """filter blank or start with options.ignore_char topic in the whole topic tree, the `topics` of every kept topic
+    is replaced with its filtered subtopics. The parser filters the topics while walking the tree instead"""
+    options = get_options(options)
+    result = filter_empty_or_ignore_children(topics, options)
+
+    stack = list(result) # 用显式栈代替递归处理子主题，层级再深也不会超出递归深度限制
+    while stack:
+        topic = stack.pop()
+        topic['topics'] = filter_empty_or_ignore_children(topic.get('topics', []), options)
+        stack.extend(topic['topics'])
+
+    return result
 
-    for topic in result: #函数递归地处理 topics 列表中的子主题（sub_topics）。这是因为主题可以包含子主题。过滤之后，将有效的主题添加到 result 中
-        sub_topics = topic.get('topics', [])
-        topic['topics'] = filter_empty_or_ignore_topic(sub_topics)
 
-    return result # 最终，返回包含有效主题的 result 列表。
+def filter_empty_or_ignore_children(topics, options=None):
+    """filter blank or start with options.ignore_char topic of one level, the subtopics are left untouched"""
+    ignore_char = get_options(options).ignore_char
+    return [topic for topic in topics if topic['title'] and topic['title'].strip() and topic['title'][0] not in ignore_char]
 
 # 上述filter_empty_or_ignore_topic方法可以改写为更易懂的传统方法：
-def filter_empty_or_ignore_topic2(topics):
-    """过滤空白或以config.ignore_char开头的主题"""
+def filter_empty_or_ignore_topic2(topics, options=None):
+    """过滤空白或以options.ignore_char开头的主题"""
+    options = get_options(options)
     result = []
 
     for topic in topics:
         if (
             topic['title'] is not None
             and topic['title'].strip() != ''
-            or topic['title'][0] not in config['ignore_char']
+            or topic['title'][0] not in options.ignore_char
         ):
             result.append(topic)
 
     for topic in result:
         sub_topics = topic.get('topics', [])
-        topic['topics'] = filter_empty_or_ignore_topic(sub_topics)
+        topic['topics'] = filter_empty_or_ignore_topic(sub_topics, options)
 
     return result
 
 
-def filter_empty_or_ignore_element(values):
+def filter_empty_or_ignore_element(values, options=None):
     """Filter all empty or ignore XMind elements, especially notes、comments、labels element"""
+    ignore_char = get_options(options).ignore_char
     result = []
     for value in values:
-        if isinstance(value, str) and not value.strip() == '' and not value[0] in config['ignore_char']:
-            result.append(value.strip())
+        value = _filter_element(value, ignore_char)
+        if value is not None:
+            result.append(value)
     return result
 
 
-def sheet_to_suite(root_topic):
-    """convert a xmind sheet to a `TestSuite` instance"""
+def _filter_element(value, ignore_char):
+    """Return the stripped element, or None if it is empty or ignored"""
+    if isinstance(value, str) and not value.strip() == '' and not value[0] in ignore_char:
+        return value.strip()
+    return None
+
+
+def sheet_to_suite(root_topic, options=None, subtree_cache=None):
+    """convert a xmind sheet to a `TestSuite` instance
+
+    :param subtree_cache: an optional `xmind2testcase.cache.SubtreeCache` of the parsed testsuites and testcases
+    """
     suite = TestSuite() # 创建一个空的TestSuite对象，并赋值给变量suite。
-    root_title = root_topic['title'] # 从root_topic中提取根主题的名称，存储在变量root_title中。
+    root_title, sheet_options = parse_root_title(root_topic['title'], options) # 从root_topic中提取根主题的名称，以及使用该画布用例标题分隔符的选项
+
+    suite.name = root_title # 将经过处理的测试套件名称root_title赋值给suite的name属性。
+    suite.details = root_topic['note'] # 将root_topic中的测试套件详细信息赋值给suite的details属性。
+    suite.sub_suites = []
+    suite.stats = TestStatistics(root_title) # 画布的统计数据由各个子测试套件的统计数据汇总而来
+    memo = subtree_cache.for_sheet(sheet_options) if subtree_cache is not None else None # 按子树摘要查找上次的解析结果，未修改的子树直接复用
+
+    # 使用函数 parse_testsuite 来处理 root_topic['topics'] 中未被过滤的每个字典元素，并将其转换为对应的子测试套件对象，并添加到 suite.sub_suites 列表中。
+    for suite_dict in filter_empty_or_ignore_children(root_topic.get('topics', []), sheet_options):
+        sub_suite = parse_testsuite(suite_dict, sheet_options, memo)
+        suite.sub_suites.append(sub_suite)
+        suite.stats.add_child(sub_suite.stats)
+
+    return suite
+
+
+def parse_root_title(root_title, options=None):
+    """Detect the testcase title separator by the last char of the root title
+
+    :return: (the root title without the separator, a copy of the options using the separator)
+    """
+    options = get_options(options)
     separator = root_title[-1] # 获取root_title的最后一个字符，将其存储在变量separator中。
 
-    if separator in config['valid_sep']: # 判断separator是否存在于全局配置项config['valid_sep']中，即是否为一个有效的分隔符。
+    if separator in options.valid_sep: # 判断separator是否存在于options.valid_sep中，即是否为一个有效的分隔符。
         logging.debug('find a valid separator for connecting testcase title: %s', separator)
-        config['sep'] = separator  # set the separator for the testcase's title
         root_title = root_title[:-1] # 如果是有效的分隔符，则从测试套件的名称root_title中去掉分隔符
     else:
-        config['sep'] = ' ' # 如果separator不是有效的分隔符，则将全局配置项config['sep']设置为默认值' '（空格）
+        separator = ' ' # 如果separator不是有效的分隔符，则使用默认值' '（空格）
 
-    suite.name = root_title # 将经过处理的测试套件名称root_title赋值给suite的name属性。
-    suite.details = root_topic['note'] # 将root_topic中的测试套件详细信息赋值给suite的details属性。
-    suite.sub_suites = []
+    # set the separator for the testcase's title of this sheet only, the shared options are never changed
+    return root_title, options.replace(sep=separator)
 
-    # 使用递归调用函数 parse_testsuite 来处理 root_topic['topics'] 中的每个字典元素，并将其转换为对应的子测试套件对象，并添加到 suite.sub_suites 列表中。
-    for suite_dict in root_topic['topics']:
-        suite.sub_suites.append(parse_testsuite(suite_dict))
 
-    return suite
+def parse_testsuite(suite_dict, options=None, memo=None):
+    """convert a testsuite topic to a `TestSuite`
 
+    :param memo: an optional `xmind2testcase.cache.SubtreeMemo` of the sheet, an unchanged testsuite is returned from
+                 it, and only the changed branches of a changed testsuite are parsed
+    """
+    options = get_options(options)
+    if memo is not None:
+        testsuite = memo.get('suite', suite_dict, levels=1)
+        if testsuite is not None:
+            logging.debug('testsuite(%s) is unchanged, reuse its parsed result', testsuite.name)
+            return testsuite
 
-def parse_testsuite(suite_dict):
     testsuite = TestSuite()
     testsuite.name = suite_dict['title']
     testsuite.details = suite_dict['note']
     testsuite.testcase_list = []
+    testsuite.stats = TestStatistics(testsuite.name)
     logging.debug('start to parse a testsuite: %s', testsuite.name)
 
-    for cases_dict in suite_dict.get('topics', []):
-        for case in recurse_parse_testcase(cases_dict):
-            testsuite.testcase_list.append(case)
+    for cases_dict in filter_empty_or_ignore_children(suite_dict.get('topics', []), options):
+        if memo is None:
+            testsuite.testcase_list.extend(recurse_parse_testcase(cases_dict, options=options, stats=testsuite.stats))
+            continue
 
-    logging.debug('testsuite(%s) parsing complete: %s', testsuite.name, testsuite.to_dict())
+        # the testcases of a branch only depend on its subtree, since a testsuite topic adds no prefix to them
+        branch = memo.get('branch', cases_dict)
+        if branch is None:
+            branch_stats = TestStatistics()
+            branch = tuple(recurse_parse_testcase(cases_dict, options=options, stats=branch_stats)), branch_stats
+            memo.put('branch', cases_dict, branch)
+        cases, branch_stats = branch
+        testsuite.testcase_list.extend(cases)
+        testsuite.stats.extend(branch_stats)
+
+    if memo is not None:
+        memo.put('suite', suite_dict, testsuite, levels=1)
+    logging.debug('testsuite(%s) parsing complete: %s testcases', testsuite.name, len(testsuite.testcase_list))
+    if is_trace_enabled():
+        trace('testsuite(%s) parsed: %s', testsuite.name, testsuite.to_dict())
     return testsuite
 
 
-def recurse_parse_testcase(case_dict, parent=None):
-    if is_testcase_topic(case_dict):
-        case = parse_a_testcase(case_dict, parent)
-        yield case
-    else:
-        if not parent:
-            parent = []
-
-        parent.append(case_dict)
-
-        for child_dict in case_dict.get('topics', []):
-            for case in recurse_parse_testcase(child_dict, parent):
-                yield case
+def recurse_parse_testcase(case_dict, parent=None, options=None, stats=None):
+    """Walk the topic tree of case_dict and yield its testcases in the depth-first order
+
+    The tree is walked with an explicit stack instead of nested generators, so the cost of a testcase doesn't
+    depend on its depth and there is no recursion limit. Blank or ignored subtopics are skipped in the same walk.
+
+    :param case_dict: a topic under a testsuite, it should have been filtered by the caller
+    :param parent: the ancestor topics of case_dict
+    :param stats: an optional `xmind2testcase.metadata.TestStatistics` of the parent topic, the testcases are
+                  counted into it and the intermediate topics are added as its children, once all are yielded
+    """
+    options = get_options(options)
+    prefix = gen_ancestor_prefix(parent or [], options)
+    # the unvisited topics of each level, with the prefix of their ancestors and the statistics of their parent
+    stack = [(iter((case_dict,)), prefix, stats)]
+
+    while stack:
+        topics, prefix, node_stats = stack[-1]
+        topic = next(topics, None)
+        if topic is None:
+            stack.pop()
+            if node_stats is not None and stack:
+                stack[-1][2].add(node_stats)  # roll the finished topic up to its parent
+            continue
 
-        parent.pop()
+        children = None if get_priority(topic, options) else \
+            filter_empty_or_ignore_children(topic.get('topics', []), options)
+        if children:
+            # the title, preconditions... of this topic are joined once here and shared by all of its testcases
+            child_stats = None
+            if node_stats is not None:
+                child_stats = TestStatistics(topic['title'])
+                node_stats.children.append(child_stats)
+            stack.append((iter(children), extend_ancestor_prefix(prefix, topic, options), child_stats))
+        else:
+            testcase = parse_a_testcase_with_prefix(topic, prefix, options)
+            if node_stats is not None:
+                node_stats.count(testcase)
+            yield testcase
 
 
-def is_testcase_topic(case_dict):
+def is_testcase_topic(case_dict, options=None):
     """A topic with a priority marker, or no subtopic, indicates that it is a testcase"""
-    priority = get_priority(case_dict)
+    priority = get_priority(case_dict, options)
     if priority:
         return True
 
-    children = case_dict.get('topics', [])
+    children = filter_empty_or_ignore_children(case_dict.get('topics', []), options)
     if children:
         return False
 
     return True
 
 
-def parse_a_testcase(case_dict, parent):
-    testcase = TestCase()
-    topics = parent + [case_dict] if parent else [case_dict]
+def parse_a_testcase(case_dict, parent, options=None):
+    options = get_options(options)
+    return parse_a_testcase_with_prefix(case_dict, gen_ancestor_prefix(parent or [], options), options)
 
-    testcase.name = gen_testcase_title(topics)
 
-    preconditions = gen_testcase_preconditions(topics)
-    testcase.preconditions = preconditions if preconditions else '无'
+def gen_ancestor_prefix(topics, options=None):
+    """Join the title, preconditions, summary and execution type of the ancestor topics, see `extend_ancestor_prefix`"""
+    options = get_options(options)
+    prefix = EMPTY_PREFIX
+    for topic in topics:
+        prefix = extend_ancestor_prefix(prefix, topic, options)
+    return prefix
+
+
+def extend_ancestor_prefix(prefix, topic, options):
+    """Extend the prefix of the ancestors with a topic
+
+    A prefix is (joined titles, joined preconditions, joined summaries, the execution type of the deepest label or None),
+    the same as `gen_testcase_title`, `gen_testcase_preconditions`, `gen_testcase_summary` and `get_execution_type`
+    of all the topics, but every ancestor is only joined once for all the testcases under it.
+    """
+    title, preconditions, summary, execution_type = prefix
+    ignore_char = options.ignore_char
+
+    value = _filter_element(topic['title'], ignore_char)
+    if value is not None:
+        title = title + options.title_separator + value if title else value
+
+    value = _filter_element(topic['note'], ignore_char)
+    if value is not None:
+        # identical preconditions are shared by the testcases instead of being copied
+        preconditions = sys.intern(preconditions + options.precondition_sep + value if preconditions else value)
+
+    value = _filter_element(topic['comment'], ignore_char)
+    if value is not None:
+        summary = summary + options.summary_sep + value if summary else value
+
+    value = _filter_element(topic.get('label', ''), ignore_char)
+    if value is not None:
+        execution_type = options.vocabulary.get_execution_type(value) or execution_type
+
+    return title, preconditions, summary, execution_type
+
 
-    summary = gen_testcase_summary(topics)
+def parse_a_testcase_with_prefix(case_dict, prefix, options=None):
+    """Parse a testcase topic, its title, preconditions... are its ancestors' prefix extended with itself"""
+    options = get_options(options)
+    testcase = TestCase()
+    title, preconditions, summary, execution_type = extend_ancestor_prefix(prefix, case_dict, options)
+
+    testcase.name = title
+    testcase.preconditions = preconditions if preconditions else '无'
     testcase.summary = summary if summary else testcase.name
-    testcase.execution_type = get_execution_type(topics)
-    testcase.importance = get_priority(case_dict) or 2
+    testcase.execution_type = execution_type or ExecutionType.MANUAL
+    # the result and the priority of the testcase come from one pass over its markers
+    result, priority = options.vocabulary.classify_markers(case_dict['markers'])
+    testcase.importance = priority or Importance.MIDDLE
 
-    step_dict_list = case_dict.get('topics', [])
+    step_dict_list = filter_empty_or_ignore_children(case_dict.get('topics', []), options)
     if step_dict_list:
-        testcase.steps = parse_test_steps(step_dict_list)
+        testcase.steps = parse_test_steps(step_dict_list, options)
 
     # the result of the testcase take precedence over the result of the teststep
-    testcase.result = get_test_result(case_dict['markers'])
+    testcase.result = result
 
-    if testcase.result == 0 and testcase.steps:
+    if testcase.result == TestResult.NON_EXECUTION and testcase.steps:
         for step in testcase.steps:
-            if step.result == 2:
-                testcase.result = 2
+            if step.result == TestResult.FAILED:
+                testcase.result = TestResult.FAILED
                 break
-            if step.result == 3:
-                testcase.result = 3
+            if step.result == TestResult.BLOCKED:
+                testcase.result = TestResult.BLOCKED
                 break
 
             testcase.result = step.result  # there is no need to judge where test step are ignored
 
-    logging.debug('finds a testcase: %s', testcase.to_dict())
+    if is_trace_enabled():
+        trace('finds a testcase: %s', testcase.to_dict())
     return testcase
 
 
-def get_execution_type(topics):
+def get_execution_type(topics, options=None):
+    vocabulary = get_options(options).vocabulary
     labels = [topic.get('label', '') for topic in topics]
-    labels = filter_empty_or_ignore_element(labels)
-    exe_type = 1
+    labels = filter_empty_or_ignore_element(labels, options)
+    exe_type = ExecutionType.MANUAL
     for item in labels[::-1]:
-        if item.lower() in ['自动', 'auto', 'automate', 'automation']:
-            exe_type = 2
-            break
-        if item.lower() in ['手动', '手工', 'manual']:
-            exe_type = 1
+        label_type = vocabulary.get_execution_type(item) # 标签词汇表中的执行方式，如：自动、手动
+        if label_type:
+            exe_type = label_type
             break
     return exe_type
 
 
-def get_priority(case_dict):
+def get_priority(case_dict, options=None):
     """Get the topic's priority（equivalent to the importance of the testcase)"""
-    if isinstance(case_dict['markers'], list): # 检查测试用例数据字典中的 'markers' 是否是一个列表。
-        for marker in case_dict['markers']: # 如果 'markers' 是一个列表，就遍历其中的每个标记。
-            if marker.startswith('priority'): # 检查标记是否以 'priority' 开头，这是一个表示优先级的标记。
-                return int(marker[-1]) # 如果找到优先级相关的标记，将标记的最后一个字符（通常是优先级的数值）转换为整数并返回。
+    # 在标记词汇表中查找第一个优先级标记（如 priority-1），返回其优先级数值，没有优先级标记时返回None
+    return get_options(options).vocabulary.get_priority(case_dict['markers'])
 
 
-def gen_testcase_title(topics):
+def gen_testcase_title(topics, options=None):
     """Link all topic's title as testcase title"""
+    options = get_options(options)
     titles = [topic['title'] for topic in topics]
-    titles = filter_empty_or_ignore_element(titles)
-
-    # when separator is not blank, will add space around separator, e.g. '/' will be changed to ' / '
-    separator = config['sep']
-    if separator != ' ':
-        separator = ' {} '.format(separator)
+    titles = filter_empty_or_ignore_element(titles, options)
+    return options.title_separator.join(titles)
 
-    return separator.join(titles)
 
-
-def gen_testcase_preconditions(topics):
+def gen_testcase_preconditions(topics, options=None):
+    options = get_options(options)
     notes = [topic['note'] for topic in topics]
-    notes = filter_empty_or_ignore_element(notes)
-    return config['precondition_sep'].join(notes)
+    notes = filter_empty_or_ignore_element(notes, options)
+    return options.precondition_sep.join(notes)
 
 
-def gen_testcase_summary(topics):
+def gen_testcase_summary(topics, options=None):
+    options = get_options(options)
     comments = [topic['comment'] for topic in topics]
-    comments = filter_empty_or_ignore_element(comments)
-    return config['summary_sep'].join(comments)
+    comments = filter_empty_or_ignore_element(comments, options)
+    return options.summary_sep.join(comments)
 
 
-def parse_test_steps(step_dict_list):
+def parse_test_steps(step_dict_list, options=None):
     steps = []
 
     for step_num, step_dict in enumerate(step_dict_list, 1):
-        test_step = parse_a_test_step(step_dict)
+        test_step = parse_a_test_step(step_dict, options)
         test_step.step_number = step_num
         steps.append(test_step)
 
     return steps
 
 
-def parse_a_test_step(step_dict):
+def parse_a_test_step(step_dict, options=None):
     test_step = TestStep()
     test_step.actions = step_dict['title']
 
-    expected_topics = step_dict.get('topics', [])
+    expected_topics = filter_empty_or_ignore_children(step_dict.get('topics', []), options)
     if expected_topics:  # have expected result
         expected_topic = expected_topics[0]
         test_step.expectedresults = expected_topic['title']  # one test step action, one test expected result
         markers = expected_topic['markers']
-        test_step.result = get_test_result(markers)
+        test_step.result = get_test_result(markers, options)
     else:  # only have test step
         markers = step_dict['markers']
-        test_step.result = get_test_result(markers)
+        test_step.result = get_test_result(markers, options)
 
-    logging.debug('finds a teststep: %s', test_step.to_dict())
+    if is_trace_enabled():
+        trace('finds a teststep: %s', test_step.to_dict())
     return test_step
 
 
-def get_test_result(markers):
-    """test result: non-execution:0, pass:1, failed:2, blocked:3, skipped:4"""
-    if isinstance(markers, list):
-        if 'symbol-right' in markers or 'c_simbol-right' in markers:
-            result = 1
-        elif 'symbol-wrong' in markers or 'c_simbol-wrong' in markers:
-            result = 2
-        elif 'symbol-pause' in markers or 'c_simbol-pause' in markers:
-            result = 3
-        elif 'symbol-minus' in markers or 'c_simbol-minus' in markers:
-            result = 4
-        else:
-            result = 0
-    else:
-        result = 0
+def get_test_result(markers, options=None):
+    """test result: non-execution:0, pass:1, failed:2, blocked:3, skipped:4
 
-    return result
+    The result markers are looked up in the vocabulary, right > wrong > pause > minus if a topic has several of them
+    """
+    return get_options(options).vocabulary.get_test_result(markers)
 
 
 
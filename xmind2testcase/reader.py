@@ -0,0 +1,273 @@
+#!/usr/bin/env python
+# _*_ coding:utf-8 _*_
+import json
+import logging
+import zipfile
+from xml.etree.ElementTree import iterparse, parse
+
+"""
+Read a XMind file into the same sheet/topic dicts as `xmind.load(xmind_file).getData()`, without building the DOM
+
+The content.xml (XMind 8 and the earlier versions) is read incrementally, each topic dict is emitted as soon as its
+element is parsed, and the element memory is freed as soon as its subtree finishes.
+
+The content.json (XMind Zen, XMind 2020 and the later versions) is mapped to the same dicts sheet by sheet. The
+standard library has no incremental json parser, so the json is loaded at once, but every sheet is released as soon
+as it has been yielded. A Zen file also has a content.xml which only tells the old versions to upgrade, so the
+content.json is always preferred.
+"""
+
+CONTENT_XML = 'content.xml'
+CONTENT_JSON = 'content.json'
+COMMENTS_XML = 'comments.xml'
+
+TAG_SHEET = 'sheet'
+TAG_TOPIC = 'topic'
+TAG_TITLE = 'title'
+TAG_NOTES = 'notes'
+TAG_PLAIN = 'plain'
+TAG_LABELS = 'labels'
+TAG_LABEL = 'label'
+TAG_MARKER_REFS = 'marker-refs'
+TAG_MARKER_REF = 'marker-ref'
+TAG_CHILDREN = 'children'
+TAG_TOPICS = 'topics'
+TAG_COMMENT = 'comment'
+TAG_CONTENT = 'content'
+
+ATTR_ID = 'id'
+ATTR_HREF = '{http://www.w3.org/1999/xlink}href'
+ATTR_TYPE = 'type'
+ATTR_MARKER_ID = 'marker-id'
+ATTR_OBJECT_ID = 'object-id'
+
+TOPIC_ATTACHED = 'attached'
+
+ZEN_ROOT_TOPIC = 'rootTopic'
+ZEN_CHILDREN = 'children'
+ZEN_NOTES = 'notes'
+ZEN_PLAIN = 'plain'
+ZEN_CONTENT = 'content'
+ZEN_LABELS = 'labels'
+ZEN_MARKERS = 'markers'
+ZEN_MARKER_ID = 'markerId'
+ZEN_HREF = 'href'
+
+
+def is_xmind_content_file(xmind_file):
+    """Whether the XMind file can be read by this module, i.e. it has a content.json or a content.xml"""
+    return get_content_file_name(xmind_file) is not None
+
+
+def get_content_file_name(xmind_file):
+    """Detect the format of a XMind file from its zip entries
+
+    :return: CONTENT_JSON for XMind Zen and the later versions, CONTENT_XML for XMind 8 and the earlier versions,
+             or None if it is not a zip file with either of them
+    """
+    if not zipfile.is_zipfile(xmind_file):
+        return None
+
+    with zipfile.ZipFile(xmind_file) as zip_file:
+        return _content_file_name(zip_file)
+
+
+def _content_file_name(zip_file):
+    names = set(zip_file.namelist())
+    for name in (CONTENT_JSON, CONTENT_XML):
+        if name in names:
+            return name
+    return None
+
+
+def get_xmind_content(xmind_file):
+    """Read all sheets of a XMind file into a list of sheet dicts"""
+    return list(iter_xmind_sheets(xmind_file))
+
+
+def iter_xmind_sheets(xmind_file):
+    """Read the content.json or the content.xml of a XMind file and yield its sheet dicts one by one"""
+    with zipfile.ZipFile(xmind_file) as zip_file:
+        if _content_file_name(zip_file) == CONTENT_JSON:
+            with zip_file.open(CONTENT_JSON) as content_stream:
+                for sheet in iter_zen_content_sheets(content_stream):
+                    yield sheet
+            return
+
+        comments = read_comments(zip_file)
+        with zip_file.open(CONTENT_XML) as content_stream:
+            for sheet in iter_content_sheets(content_stream, comments):
+                yield sheet
+
+
+def read_comments(zip_file):
+    """Read the comments.xml into a {topic id: comment content} mapping"""
+    comments = {}
+    if COMMENTS_XML not in zip_file.namelist():
+        return comments
+
+    with zip_file.open(COMMENTS_XML) as comments_stream:
+        for element in parse(comments_stream).getroot():
+            if _local_name(element.tag) != TAG_COMMENT:
+                continue
+
+            object_id = element.get(ATTR_OBJECT_ID)
+            content = None
+            for child in element:
+                if _local_name(child.tag) == TAG_CONTENT:
+                    content = _text_content(child)
+                    break
+
+            if content is None:
+                continue
+            if object_id in comments:
+                comments[object_id] = comments[object_id] + '\n' + content
+            else:
+                comments[object_id] = content
+
+    return comments
+
+
+def iter_content_sheets(content_stream, comments=None):
+    """Incrementally parse a content.xml stream and yield the sheet dicts one by one"""
+    comments = comments or {}
+    stack = []  # the opened elements
+    topics = {}  # opened topic element => its topic dict
+    attached = {}  # opened attached topics element => the topic dict which owns it
+    owners = set()  # opened topic elements which have found their attached topics element
+    root = None
+    sheet = None
+
+    for event, element in iterparse(content_stream, events=('start', 'end')):
+        tag = _local_name(element.tag)
+
+        if event == 'start':
+            parent = stack[-1] if stack else None
+            stack.append(element)
+
+            if root is None:
+                root = element
+            elif tag == TAG_SHEET and parent is root:
+                sheet = {'id': element.get(ATTR_ID), 'title': None, 'topic': None}
+            elif tag == TAG_TOPIC and sheet is not None and parent is not None and _local_name(parent.tag) == TAG_SHEET:
+                if sheet['topic'] is None:
+                    sheet['topic'] = topics[element] = _new_topic(element, comments)
+            elif tag == TAG_TOPIC and parent in attached:
+                parent_topic = attached[parent]
+                topic = topics[element] = _new_topic(element, comments)
+                parent_topic.setdefault('topics', []).append(topic)
+            elif tag == TAG_TOPICS and element.get(ATTR_TYPE) == TOPIC_ATTACHED and len(stack) > 2:
+                owner = stack[-3]
+                if _local_name(parent.tag) == TAG_CHILDREN and owner in topics and owner not in owners:
+                    owners.add(owner)
+                    attached[element] = topics[owner]
+            continue
+
+        # end event: the element and all of its descendants have been parsed
+        stack.pop()
+        parent = stack[-1] if stack else None
+
+        if tag == TAG_TOPIC and element in topics:
+            topics.pop(element)
+            owners.discard(element)
+            element.clear()  # free the finished subtree, its topic dict has been built
+        elif tag == TAG_TOPICS and element in attached:
+            attached.pop(element)
+        elif tag == TAG_TITLE and parent in topics:
+            topic = topics[parent]
+            if topic['title'] is None:
+                topic['title'] = _text_content(element)
+        elif tag == TAG_TITLE and sheet is not None and parent is not None and _local_name(parent.tag) == TAG_SHEET:
+            if sheet['title'] is None:
+                sheet['title'] = _text_content(element)
+        elif tag == TAG_PLAIN and len(stack) > 1 and _local_name(parent.tag) == TAG_NOTES and stack[-2] in topics:
+            topic = topics[stack[-2]]
+            if topic['note'] is None:
+                topic['note'] = _text_content(element)
+        elif tag == TAG_LABEL and len(stack) > 1 and _local_name(parent.tag) == TAG_LABELS and stack[-2] in topics:
+            topic = topics[stack[-2]]
+            if topic['label'] is None:
+                topic['label'] = _text_content(element)
+        elif tag == TAG_MARKER_REF and len(stack) > 1 and _local_name(parent.tag) == TAG_MARKER_REFS and stack[-2] in topics:
+            topics[stack[-2]]['markers'].append(element.get(ATTR_MARKER_ID))
+        elif tag == TAG_SHEET and sheet is not None and parent is root:
+            if sheet['topic'] is None:
+                sheet['topic'] = _new_topic(None, comments)
+            logging.debug('read a sheet(%s) from the XMind content', sheet['title'])
+            yield sheet
+            sheet = None
+            element.clear()
+            root.remove(element)
+
+
+def iter_zen_content_sheets(content_stream):
+    """Parse a content.json stream of XMind Zen and yield the sheet dicts one by one"""
+    sheets = json.load(content_stream)
+    if isinstance(sheets, dict):
+        sheets = [sheets]
+    sheets.reverse()  # pop the sheets in order, a sheet's json is released once it is converted
+
+    while sheets:
+        sheet_data = sheets.pop()
+        sheet = {'id': sheet_data.get('id'),
+                 'title': sheet_data.get('title'),
+                 'topic': zen_topic_to_dict(sheet_data.get(ZEN_ROOT_TOPIC) or {})}
+        logging.debug('read a sheet(%s) from the XMind Zen content', sheet['title'])
+        yield sheet
+
+
+def zen_topic_to_dict(topic_data):
+    """Convert a XMind Zen topic and its attached subtopics to topic dicts, without recursion"""
+    topic = _new_zen_topic(topic_data)
+    stack = [(topic_data, topic)]
+    while stack:
+        topic_data, parent = stack.pop()
+        attached = (topic_data.get(ZEN_CHILDREN) or {}).get(TOPIC_ATTACHED)
+        if attached:
+            parent['topics'] = [_new_zen_topic(child_data) for child_data in attached]
+            stack.extend(zip(attached, parent['topics']))
+
+    return topic
+
+
+def _new_zen_topic(topic_data):
+    """A topic dict in the same shape as `_new_topic`, from a XMind Zen topic"""
+    plain = (topic_data.get(ZEN_NOTES) or {}).get(ZEN_PLAIN) or {}
+    labels = topic_data.get(ZEN_LABELS)
+    return {
+        'id': topic_data.get('id'),
+        'link': topic_data.get(ZEN_HREF),
+        'title': topic_data.get('title'),
+        'note': plain.get(ZEN_CONTENT),
+        'label': labels[0] if labels else None,  # the same as content.xml, only the first label is read
+        'comment': None,  # XMind Zen doesn't save the comments into the file
+        'markers': [marker[ZEN_MARKER_ID] for marker in topic_data.get(ZEN_MARKERS) or []
+                    if marker.get(ZEN_MARKER_ID)],
+    }
+
+
+def _new_topic(element, comments):
+    """A topic dict in the same shape as `xmind.core.topic.TopicElement.getData()`"""
+    topic_id = element.get(ATTR_ID) if element is not None else None
+    href = element.get(ATTR_HREF) if element is not None else None
+    return {
+        'id': topic_id,
+        'link': href,
+        'title': None,
+        'note': None,
+        'label': None,
+        'comment': comments.get(topic_id),
+        'markers': [],
+    }
+
+
+def _local_name(tag):
+    """Strip the namespace of a tag: '{urn:xmind:xmap:xmlns:content:2.0}topic' => 'topic'"""
+    return tag.rpartition('}')[2] if isinstance(tag, str) else ''
+
+
+def _text_content(element):
+    """Join the direct text nodes of an element, the same as `xmind.core.Node.getTextContent()`"""
+    texts = [element.text] + [child.tail for child in element]
+    texts = [text for text in texts if text]
+    return '\n'.join(texts) if texts else None
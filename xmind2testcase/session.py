@@ -0,0 +1,129 @@
+#!/usr/bin/env python
+# _*_ coding:utf-8 _*_
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from xmind2testcase.parser import get_options
+from xmind2testcase.testlink import testsuites_to_testlink_xml_file
+from xmind2testcase.zentao import testsuites_to_zentao_csv_file
+from xmind2testcase.utils import get_absolute_path, get_xmind_testsuites, testsuites_to_testcase_list, \
+    testsuites_to_testsuite_list, testsuites_to_testcase_json_file, testsuites_to_testsuite_json_file, \
+    iter_testsuites_testcase_data, testsuites_to_statistics, JSON_PRETTY, JSON_LINES, JSON_EXTENSIONS
+
+"""
+Load and parse a XMind file once, then export the same testsuites to every requested format
+"""
+
+FORMAT_JSON = 'json'
+FORMAT_TESTSUITE_JSON = 'testsuite_json'
+FORMAT_XML = 'xml'
+FORMAT_CSV = 'csv'
+FORMAT_NDJSON = 'ndjson'
+ALL_FORMATS = (FORMAT_JSON, FORMAT_XML, FORMAT_CSV)
+
+
+class ConversionSession(object):
+
+    def __init__(self, xmind_file, cache=None, options=None, parse_workers=None, sha256=None):
+        """
+        ConversionSession
+        :param xmind_file: the target XMind file, it will be loaded and parsed at most once
+        :param cache: an optional `xmind2testcase.cache.ParseCache` shared between sessions
+        :param options: an optional `xmind2testcase.parser.ParserOptions` used by the parser and the writers
+        :param parse_workers: parse the sheets of a large workbook in a process pool of this size
+        :param sha256: the known sha256 of the XMind file content, the cache key is made of it without hashing the file
+        """
+        self.xmind_file = get_absolute_path(xmind_file)
+        self.cache = cache
+        self.options = get_options(options)
+        self.parse_workers = parse_workers
+        self.sha256 = sha256
+        self._testsuites = None
+        self._lock = threading.Lock()
+
+    @property
+    def testsuites(self):
+        """the parsed `xmind2testcase.metadata.TestSuite` list, shared by all writers"""
+        with self._lock:
+            if self._testsuites is None:
+                logging.info('Start parsing XMind file(%s) for the conversion session...', self.xmind_file)
+                self._testsuites = get_xmind_testsuites(self.xmind_file, self.cache, self.options, self.parse_workers,
+                                                        self.sha256)
+        return self._testsuites
+
+    def get_testsuite_list(self):
+        return testsuites_to_testsuite_list(self.testsuites)
+
+    def get_testcase_list(self):
+        return testsuites_to_testcase_list(self.testsuites)
+
+    def get_statistics(self):
+        """the testcase counts of every sheet, testsuite and intermediate topic, no testcase data is made"""
+        return testsuites_to_statistics(self.testsuites)
+
+    def iter_testcase_data(self):
+        """iterate the testcases as lazy read-only mappings, nothing is copied"""
+        return iter_testsuites_testcase_data(self.testsuites)
+
+    def to_testcase_json_file(self, style=None):
+        """:param style: the json style, see `xmind2testcase.utils.dump_json_array`"""
+        testcase_json_file = self.xmind_file[:-6] + JSON_EXTENSIONS[style or JSON_PRETTY]
+        return testsuites_to_testcase_json_file(self.testsuites, testcase_json_file, style)
+
+    def to_testcase_ndjson_file(self):
+        return self.to_testcase_json_file(JSON_LINES)
+
+    def to_testsuite_json_file(self):
+        testsuite_json_file = self.xmind_file[:-6] + '_testsuite.json'
+        return testsuites_to_testsuite_json_file(self.testsuites, testsuite_json_file)
+
+    def to_testlink_xml_file(self, is_all_sheet=True):
+        testlink_xml_file = self.xmind_file[:-6] + '.xml'
+        return testsuites_to_testlink_xml_file(self.testsuites, testlink_xml_file, is_all_sheet, self.options)
+
+    def to_zentao_csv_file(self):
+        zentao_csv_file = self.xmind_file[:-6] + '.csv'
+        return testsuites_to_zentao_csv_file(self.testsuites, zentao_csv_file)
+
+    def write(self, fmt, output_file):
+        """Export the parsed testsuites to output_file in a format, e.g. a file of `xmind2testcase.artifacts`"""
+        if fmt == FORMAT_JSON:
+            return testsuites_to_testcase_json_file(self.testsuites, output_file)
+        elif fmt == FORMAT_NDJSON:
+            return testsuites_to_testcase_json_file(self.testsuites, output_file, JSON_LINES)
+        elif fmt == FORMAT_TESTSUITE_JSON:
+            return testsuites_to_testsuite_json_file(self.testsuites, output_file)
+        elif fmt == FORMAT_XML:
+            return testsuites_to_testlink_xml_file(self.testsuites, output_file, True, self.options)
+        elif fmt == FORMAT_CSV:
+            return testsuites_to_zentao_csv_file(self.testsuites, output_file)
+        raise ValueError('Unsupported conversion format: {}'.format(fmt))
+
+    def convert(self, formats=ALL_FORMATS, max_workers=1):
+        """Export the parsed testsuites to the given formats
+
+        :param formats: some of 'json', 'ndjson', 'testsuite_json', 'xml' and 'csv'
+        :param max_workers: run the writers concurrently in a thread pool if it is greater than 1
+        :return: a dict of {format: output file}
+        """
+        writers = {FORMAT_JSON: self.to_testcase_json_file,
+                   FORMAT_NDJSON: self.to_testcase_ndjson_file,
+                   FORMAT_TESTSUITE_JSON: self.to_testsuite_json_file,
+                   FORMAT_XML: self.to_testlink_xml_file,
+                   FORMAT_CSV: self.to_zentao_csv_file}
+
+        for fmt in formats:
+            if fmt not in writers:
+                raise ValueError('Unsupported conversion format: {}'.format(fmt))
+
+        self.testsuites  # parse it once before dispatching the writers
+
+        if max_workers and max_workers > 1 and len(formats) > 1:
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                futures = {fmt: executor.submit(writers[fmt]) for fmt in formats}
+                output_files = {fmt: future.result() for fmt, future in futures.items()}
+        else:
+            output_files = {fmt: writers[fmt]() for fmt in formats}
+
+        logging.info('Convert XMind file(%s) to %s successfully!', self.xmind_file, ', '.join(formats))
+        return output_files
@@ -3,11 +3,10 @@
 import logging
 import os
 from io import BytesIO
-from xml.dom import minidom
-from xml.sax.saxutils import escape
 from xmind2testcase import const
-from xmind2testcase.parser import config
-from xmind2testcase.utils import get_xmind_testsuites, get_absolute_path
+from xmind2testcase.metadata import ExecutionType
+from xmind2testcase.parser import get_options
+from xmind2testcase.utils import get_xmind_testsuites, get_absolute_path, new_temp_file
 from xml.etree.ElementTree import Element, SubElement, ElementTree, Comment
 
 """
@@ -15,31 +14,147 @@ Convert XMind fie to TestLink testcase xml file
 """
 
 
-def xmind_to_testlink_xml_file(xmind_file, is_all_sheet=True):
+def xmind_to_testlink_xml_file(xmind_file, is_all_sheet=True, options=None):
     """Convert a XMind sheet to a testlink xml file"""
     xmind_file = get_absolute_path(xmind_file)
     logging.info('Start converting XMind file(%s) to testlink file...', xmind_file)
-    testsuites = get_xmind_testsuites(xmind_file)
+    testlink_xml_file = xmind_file[:-6] + '.xml'
+    # an existing xml file may be left over from an older XMind file of the same name, it is always written again
+    testsuites = get_xmind_testsuites(xmind_file, options=options)
+    testsuites_to_testlink_xml_file(testsuites, testlink_xml_file, is_all_sheet, options)
+    logging.info('convert XMind file(%s) to a testlink xml file(%s) successfully!', xmind_file, testlink_xml_file)
+    return testlink_xml_file
+
+
+def testsuites_to_testlink_xml_file(testsuites, testlink_xml_file, is_all_sheet=True, options=None):
+    """Write parsed testsuites to a testlink xml file"""
     if not is_all_sheet and testsuites:
         testsuites = [testsuites[0]]
 
-    xml_content = testsuites_to_xml_content(testsuites)
-    testlink_xml_file = xmind_file[:-6] + '.xml'
+    # write a temp file in the same directory and replace testlink_xml_file with it once the whole file is written,
+    # so a failed conversion never leaves a truncated xml file
+    fd, temp_file = new_temp_file(testlink_xml_file)
+    try:
+        with open(fd, 'w', encoding='utf-8') as f:
+            write_testlink_xml(f, testsuites, options)
+        os.replace(temp_file, testlink_xml_file)
+    finally:
+        if os.path.exists(temp_file):
+            os.remove(temp_file)
+
+    return testlink_xml_file
 
-    if os.path.exists(testlink_xml_file):
-        logging.info('the testlink xml file already exists, return it directly: %s', testlink_xml_file)
-        return testlink_xml_file
 
-    with open(testlink_xml_file, 'w', encoding='utf-8') as f:
-        pretty_content = minidom.parseString(xml_content).toprettyxml(indent='\t')
-        f.write(pretty_content)
-        logging.info('convert XMind file(%s) to a testlink xml file(%s) successfully!', xmind_file, testlink_xml_file)
+def write_testlink_xml(f, testsuites, options=None):
+    """Write the testsuites to a testlink xml file object incrementally, suite by suite and testcase by testcase
 
-    return testlink_xml_file
+    The output is the same as pretty printing `testsuites_to_xml_content` with `minidom.toprettyxml(indent='\\t')`,
+    but without building the ElementTree and re-parsing it.
+    """
+    options = get_options(options)
+    f.write('<?xml version="1.0" ?>\n')
+    if not testsuites:
+        f.write('<{}/>\n'.format(const.TAG_TESTSUITE))
+        return
+
+    f.write('<{}>\n'.format(const.TAG_TESTSUITE))
+    for testsuite in testsuites:
+        sub_suites = [sub_suite for sub_suite in testsuite.sub_suites if not is_should_skip(sub_suite.name, options)]
+        if not _write_start_tag(f, '\t', const.TAG_TESTSUITE, testsuite.name, is_should_parse(testsuite.details, options) or sub_suites):
+            continue
+
+        _write_text_element(f, '\t\t', const.TAG_DETAILS, testsuite.details, options)
+        for sub_suite in sub_suites:
+            write_testsuite_xml(f, '\t\t', sub_suite, options)
+        f.write('\t</{}>\n'.format(const.TAG_TESTSUITE))
+
+    f.write('</{}>\n'.format(const.TAG_TESTSUITE))
+
+
+def write_testsuite_xml(f, indent, suite, options=None):
+    options = get_options(options)
+    testcases = [testcase for testcase in suite.testcase_list if not is_should_skip(testcase.name, options)]
+    if not _write_start_tag(f, indent, const.TAG_TESTSUITE, suite.name, is_should_parse(suite.details, options) or testcases):
+        return
 
+    child_indent = indent + '\t'
+    _write_text_element(f, child_indent, const.TAG_DETAILS, suite.details, options)
+    for testcase in testcases:
+        write_testcase_xml(f, child_indent, testcase, options)
+    f.write('{}</{}>\n'.format(indent, const.TAG_TESTSUITE))
 
-def testsuites_to_xml_content(testsuites):
+
+def write_testcase_xml(f, indent, testcase, options=None):
+    options = get_options(options)
+    child_indent = indent + '\t'
+    status = str(testcase.status) if testcase.status in (1, 2, 3, 4, 5, 6, 7) else '7'
+    _write_start_tag(f, indent, const.TAG_TESTCASE, testcase.name)
+    _write_text_element(f, child_indent, const.TAG_VERSION, str(testcase.version), options)
+    _write_text_element(f, child_indent, const.TAG_SUMMARY, testcase.summary, options)
+    _write_text_element(f, child_indent, const.TAG_PRECONDITIONS, testcase.preconditions, options)
+    _write_text_element(f, child_indent, const.TAG_EXECUTION_TYPE, _convert_execution_type(testcase.execution_type, options), options)
+    _write_text_element(f, child_indent, const.TAG_IMPORTANCE, _convert_importance(testcase.importance), options)
+    _write_plain_element(f, child_indent, const.TAG_ESTIMATED_EXEC_DURATION, str(testcase.estimated_exec_duration))
+    _write_plain_element(f, child_indent, const.TAG_STATUS, status)
+
+    if testcase.steps:
+        steps = [step for step in testcase.steps if not is_should_skip(step.actions, options)]
+        if _write_start_tag(f, child_indent, const.TAG_STEPS, has_children=steps):
+            step_indent = child_indent + '\t'
+            for step in steps:
+                f.write('{}<{}>\n'.format(step_indent, const.TAG_STEP))
+                step_child_indent = step_indent + '\t'
+                _write_text_element(f, step_child_indent, const.TAG_STEP_NUMBER, str(step.step_number), options)
+                _write_text_element(f, step_child_indent, const.TAG_ACTIONS, step.actions, options)
+                _write_text_element(f, step_child_indent, const.TAG_EXPECTEDRESULTS, step.expectedresults, options)
+                _write_text_element(f, step_child_indent, const.TAG_EXECUTION_TYPE, _convert_execution_type(step.execution_type, options), options)
+                f.write('{}</{}>\n'.format(step_indent, const.TAG_STEP))
+            f.write('{}</{}>\n'.format(child_indent, const.TAG_STEPS))
+
+    f.write('{}</{}>\n'.format(indent, const.TAG_TESTCASE))
+
+
+def _write_start_tag(f, indent, tag_name, name=None, has_children=True):
+    """Write the start tag of an element, or the whole empty element if it has no children"""
+    attribute = ' {}="{}"'.format(const.ATTR_NMAE, _escape_attribute(name)) if name is not None else ''
+    if has_children:
+        f.write('{}<{}{}>\n'.format(indent, tag_name, attribute))
+        return True
+
+    f.write('{}<{}{}/>\n'.format(indent, tag_name, attribute))
+    return False
+
+
+def _write_plain_element(f, indent, tag_name, text):
+    if text:
+        f.write('{}<{}>{}</{}>\n'.format(indent, tag_name, _escape_attribute(text), tag_name))
+    else:
+        f.write('{}<{}/>\n'.format(indent, tag_name))
+
+
+def _write_text_element(f, indent, tag_name, content, options=None):
+    """write an element's text conent: <![CDATA[text]]>, wrapped by the comments that keep testlink importing it"""
+    if is_should_parse(content, options):
+        child_indent = indent + '\t'
+        f.write('{0}<{1}>\n{2}<!-- -->\n<![CDATA[{3}]]>{2} \n{2}<!-- -->\n{0}</{1}>\n'.format(
+            indent, tag_name, child_indent, _cdata_text(content)))
+
+
+def _cdata_text(content):
+    """The same text as `element_set_text` after a xml parser round trip"""
+    # retain html tags in content
+    content = content.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
+    # replace new line with a readable line break, a single carriage return is normalized to a new line by xml parsers
+    return content.replace('\r\n', '\n').replace('\n', '<br />\n').replace('\r', '\n')
+
+
+def _escape_attribute(value):
+    return value.replace('&', '&amp;').replace('<', '&lt;').replace('"', '&quot;').replace('>', '&gt;')
+
+
+def testsuites_to_xml_content(testsuites, options=None):
     """Convert the testsuites to testlink xml file format"""
+    options = get_options(options)
     root_element = Element(const.TAG_TESTSUITE)
     # setting the root suite's name attribute, that will generate a new testsuite folder on testlink
     # root_element.set(const.ATTR_NMAE, testsuite.name)
@@ -47,15 +162,15 @@ def testsuites_to_xml_content(testsuites):
     for testsuite in testsuites:
         suite_element = SubElement(root_element, const.TAG_TESTSUITE)
         suite_element.set(const.ATTR_NMAE, testsuite.name)
-        gen_text_element(suite_element, const.TAG_DETAILS, testsuite.details)
+        gen_text_element(suite_element, const.TAG_DETAILS, testsuite.details, options)
 
         for sub_suite in testsuite.sub_suites:
-            if is_should_skip(sub_suite.name):
+            if is_should_skip(sub_suite.name, options):
                 continue
             sub_suite_element = SubElement(suite_element, const.TAG_TESTSUITE)
             sub_suite_element.set(const.ATTR_NMAE, sub_suite.name)
-            gen_text_element(sub_suite_element, const.TAG_DETAILS, sub_suite.details)
-            gen_testcase_element(sub_suite_element, sub_suite)
+            gen_text_element(sub_suite_element, const.TAG_DETAILS, sub_suite.details, options)
+            gen_testcase_element(sub_suite_element, sub_suite, options)
 
     testlink = ElementTree(root_element)
     content_stream = BytesIO()
@@ -63,20 +178,21 @@ def testsuites_to_xml_content(testsuites):
     return content_stream.getvalue()
 
 
-def gen_testcase_element(suite_element, suite):
+def gen_testcase_element(suite_element, suite, options=None):
+    options = get_options(options)
     for testcase in suite.testcase_list:
 
-        if is_should_skip(testcase.name):
+        if is_should_skip(testcase.name, options):
             continue
 
         testcase_elment = SubElement(suite_element, const.TAG_TESTCASE)
         testcase_elment.set(const.ATTR_NMAE, testcase.name)
 
-        gen_text_element(testcase_elment, const.TAG_VERSION, str(testcase.version))
-        gen_text_element(testcase_elment, const.TAG_SUMMARY, testcase.summary)
-        gen_text_element(testcase_elment, const.TAG_PRECONDITIONS, testcase.preconditions)
-        gen_text_element(testcase_elment, const.TAG_EXECUTION_TYPE, _convert_execution_type(testcase.execution_type))
-        gen_text_element(testcase_elment, const.TAG_IMPORTANCE, _convert_importance(testcase.importance))
+        gen_text_element(testcase_elment, const.TAG_VERSION, str(testcase.version), options)
+        gen_text_element(testcase_elment, const.TAG_SUMMARY, testcase.summary, options)
+        gen_text_element(testcase_elment, const.TAG_PRECONDITIONS, testcase.preconditions, options)
+        gen_text_element(testcase_elment, const.TAG_EXECUTION_TYPE, _convert_execution_type(testcase.execution_type, options), options)
+        gen_text_element(testcase_elment, const.TAG_IMPORTANCE, _convert_importance(testcase.importance), options)
 
         estimated_exec_duration_element = SubElement(testcase_elment, const.TAG_ESTIMATED_EXEC_DURATION)
         estimated_exec_duration_element.text = str(testcase.estimated_exec_duration)
@@ -84,33 +200,35 @@ def gen_testcase_element(suite_element, suite):
         status = SubElement(testcase_elment, const.TAG_STATUS)
         status.text = str(testcase.status) if testcase.status in (1, 2, 3, 4, 5, 6, 7) else '7'
 
-        gen_steps_element(testcase_elment, testcase)
+        gen_steps_element(testcase_elment, testcase, options)
 
 
-def gen_steps_element(testcase_element, testcase):
+def gen_steps_element(testcase_element, testcase, options=None):
+    options = get_options(options)
     if testcase.steps:
         steps_element = SubElement(testcase_element, const.TAG_STEPS)
 
         for step in testcase.steps:
 
-            if is_should_skip(step.actions):
+            if is_should_skip(step.actions, options):
                 continue
 
             step_element = SubElement(steps_element, const.TAG_STEP)
-            gen_text_element(step_element, const.TAG_STEP_NUMBER, str(step.step_number))
-            gen_text_element(step_element, const.TAG_ACTIONS, step.actions)
-            gen_text_element(step_element, const.TAG_EXPECTEDRESULTS, step.expectedresults)
-            gen_text_element(step_element, const.TAG_EXECUTION_TYPE, _convert_execution_type(step.execution_type))
+            gen_text_element(step_element, const.TAG_STEP_NUMBER, str(step.step_number), options)
+            gen_text_element(step_element, const.TAG_ACTIONS, step.actions, options)
+            gen_text_element(step_element, const.TAG_EXPECTEDRESULTS, step.expectedresults, options)
+            gen_text_element(step_element, const.TAG_EXECUTION_TYPE, _convert_execution_type(step.execution_type, options), options)
 
 
-def gen_text_element(parent_element, tag_name, content):
+def gen_text_element(parent_element, tag_name, content, options=None):
     """generate an element's text conent: <![CDATA[text]]>"""
-    if is_should_parse(content):
+    if is_should_parse(content, options):
         child_element = SubElement(parent_element, tag_name)
         element_set_text(child_element, content)
 
 
 def element_set_text(element, content):
+    from xml.sax.saxutils import escape  # it imports urllib.request, only the legacy ElementTree writer needs it
     # retain html tags in content
     content = escape(content, entities={'\r\n': '<br />'})
     # replace new line for *nix system
@@ -122,23 +240,25 @@ def element_set_text(element, content):
     element.append(Comment(' --><![CDATA[' + content.replace(']]>', ']]]]><![CDATA[>') + ']]> <!-- '))
 
 
-def is_should_parse(content):
+def is_should_parse(content, options=None):
     """An element that has a string content and doesn't start with exclamation mark should be parsing"""
-    return isinstance(content, str) and content.strip() != '' and not content[0] in config['ignore_char']
+    return isinstance(content, str) and content.strip() != '' and not content[0] in get_options(options).ignore_char
 
 
-def is_should_skip(content):
-    """A testsuite/testcase/teststep should be skip: 1、content is empty; 2、starts with config.ignore_char"""
+def is_should_skip(content, options=None):
+    """A testsuite/testcase/teststep should be skip: 1、content is empty; 2、starts with options.ignore_char"""
     return content is None or \
         not isinstance(content, str) or \
         content.strip() == '' or \
-        content[0] in config['ignore_char']
+        content[0] in get_options(options).ignore_char
 
 
-def _convert_execution_type(value):
-    if value in (1, '手动', '手工', 'manual', 'Manual'):
-        return '1'
-    elif value in (2, '自动', '自动化', '自动的', 'Automate', 'Automated', 'Automation', 'automate', 'automated', 'automation'):
+def _convert_execution_type(value, options=None):
+    """manual: '1', automate: '2', the label words are looked up in the parser vocabulary"""
+    if isinstance(value, str):
+        value = get_options(options).vocabulary.get_execution_type(value)
+
+    if value == ExecutionType.AUTOMATE:
         return '2'
     else:
         return '1'
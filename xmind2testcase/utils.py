@@ -2,9 +2,17 @@
 # _*_ coding:utf-8 _*_
 import json
 import os
-import xmind
 import logging
-from xmind2testcase.parser import xmind_to_testsuites
+import tempfile
+from xmind2testcase.log import is_trace_enabled, trace
+from xmind2testcase.metadata import ModelView, TestResult, TestStatistics
+from xmind2testcase.parser import xmind_to_testsuites, iter_testcases, get_options
+from xmind2testcase.reader import get_content_file_name, iter_xmind_sheets
+
+JSON_PRETTY = 'pretty'
+JSON_COMPACT = 'compact'
+JSON_LINES = 'ndjson'
+JSON_EXTENSIONS = {JSON_PRETTY: '.json', JSON_COMPACT: '.json', JSON_LINES: '.ndjson'}
 
 
 def get_absolute_path(path):
@@ -24,24 +32,79 @@ def get_absolute_path(path):
     return os.path.join(fp, fn) # 将经过处理的目录路径fp与原始的文件名fn组合起来，使用os.path.join()函数生成完整的绝对路径
 
 
+def new_temp_file(path):
+    """Create a uniquely named temp file in the directory of path, to be written and then `os.replace`d onto path
+
+    Unlike `tempfile.mkstemp`, the temp file gets the permissions of a file created by `open` (0666 less the umask,
+    applied by the OS), not 0600.
+
+    :return: (the file descriptor opened for writing, the temp file path)
+    """
+    directory = os.path.dirname(path) or '.'
+    flags = os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, 'O_BINARY', 0)
+    for _ in range(tempfile.TMP_MAX):
+        temp_file = os.path.join(directory, 'tmp{}.tmp'.format(os.urandom(8).hex()))
+        try:
+            return os.open(temp_file, flags, 0o666), temp_file
+        except FileExistsError:
+            continue
+    raise FileExistsError('No usable temporary file name found in {}'.format(directory))
 
-def get_xmind_testsuites(xmind_file):
-    """Load the XMind file and parse to `xmind2testcase.metadata.TestSuite` list"""
+
+def get_xmind_testsuites(xmind_file, cache=None, options=None, max_workers=None, sha256=None):
+    """Load the XMind file and parse to `xmind2testcase.metadata.TestSuite` list
+
+    :param xmind_file: the target XMind file
+    :param cache: an optional `xmind2testcase.cache.ParseCache`, an unchanged file will not be parsed again, and only
+                  the changed topic subtrees of an edited file are parsed
+    :param options: an optional `xmind2testcase.parser.ParserOptions`
+    :param max_workers: parse the sheets of a large workbook in a process pool of this size if it is greater than 1
+    :param sha256: the known sha256 of the XMind file content for the cache key, the file is hashed if it is not given
+    """
     xmind_file = get_absolute_path(xmind_file)
+    options = get_options(options)
+    if cache is not None:
+        return cache.get_or_parse(xmind_file, options.to_dict(),
+                                  lambda path: parse_xmind_testsuites(path, options, max_workers, cache.subtrees),
+                                  sha256)
+    return parse_xmind_testsuites(xmind_file, options, max_workers)
+
+
+def parse_xmind_testsuites(xmind_file, options=None, max_workers=None, subtree_cache=None):
+    """Load and parse the XMind file without the whole file cache
+
+    :param subtree_cache: an optional `xmind2testcase.cache.SubtreeCache`, see `xmind_to_testsuites`
+    """
+    xmind_content = iter_xmind_content(xmind_file)
+    testsuites = xmind_to_testsuites(xmind_content, options, max_workers, subtree_cache=subtree_cache)
+
+    if not testsuites:
+        logging.error('Invalid XMind file(%s): it is empty!', xmind_file)
+    return testsuites
+
+
+def iter_xmind_content(xmind_file):
+    """Load the XMind file content and iterate its sheet dicts
+
+    The content.json (XMind Zen and the later versions) or the content.xml is read sheet by sheet with the built-in
+    reader, other files fall back to the xmind library which loads the whole workbook at once.
+    """
+    content_file_name = get_content_file_name(xmind_file)
+    if content_file_name:
+        logging.debug('loading XMind file(%s) with the built-in %s reader', xmind_file, content_file_name)
+        return iter_xmind_sheets(xmind_file)
+
+    import xmind  # the xmind library is only needed by the files the streaming reader doesn't support
     # 加载XMind文件并返回一个xmind2.xmind.Workbook对象。这个对象代表整个XMind工作簿
     workbook = xmind.load(xmind_file)
     xmind_content_dict = workbook.getData() # 从workbook对象中获取XMind文件的内容，以Python字典的形式表示。字典的结构对应了XMind文件的层次结构。getData() 函数是 xmind 库中的一个方法
-    logging.debug("loading XMind file(%s) dict data: %s", xmind_file, xmind_content_dict)
-
-    if xmind_content_dict: # 检查xmind_content_dict是否非空，即是否成功加载了XMind文件的内容。
-        testsuites = xmind_to_testsuites(xmind_content_dict)
-        return testsuites
-    else:
-        logging.error('Invalid XMind file(%s): it is empty!', xmind_file)
-        return []
+    logging.debug('loading XMind file(%s) with the xmind library: %s sheets', xmind_file, len(xmind_content_dict))
+    if is_trace_enabled():
+        trace('XMind file(%s) dict data: %s', xmind_file, xmind_content_dict)
+    return iter(xmind_content_dict)
 
 
-def get_xmind_testsuite_list(xmind_file):
+def get_xmind_testsuite_list(xmind_file, options=None):
     """Load the XMind file and get all testsuite in it
 
     :param xmind_file: the target XMind file
@@ -49,39 +112,74 @@ def get_xmind_testsuite_list(xmind_file):
     """
     xmind_file = get_absolute_path(xmind_file)
     logging.info('Start converting XMind file(%s) to testsuite data list...', xmind_file)
-    testsuite_list = get_xmind_testsuites(xmind_file)
-    suite_data_list = []
-
-    for testsuite in testsuite_list:
-        product_statistics = {'case_num': 0, 'non_execution': 0, 'pass': 0, 'failed': 0, 'blocked': 0, 'skipped': 0}
-        for sub_suite in testsuite.sub_suites:
-            suite_statistics = {'case_num': len(sub_suite.testcase_list), 'non_execution': 0, 'pass': 0, 'failed': 0, 'blocked': 0, 'skipped': 0}
-            for case in sub_suite.testcase_list:
-                if case.result == 0:
-                    suite_statistics['non_execution'] += 1
-                elif case.result == 1:
-                    suite_statistics['pass'] += 1
-                elif case.result == 2:
-                    suite_statistics['failed'] += 1
-                elif case.result == 3:
-                    suite_statistics['blocked'] += 1
-                elif case.result == 4:
-                    suite_statistics['skipped'] += 1
-                else:
-                    logging.warning('This testcase result is abnormal: %s, please check it: %s', case.result, case.to_dict())
-            sub_suite.statistics = suite_statistics
-            for item in product_statistics:
-                product_statistics[item] += suite_statistics[item]
-
-        testsuite.statistics = product_statistics
-        suite_data = testsuite.to_dict()
-        suite_data_list.append(suite_data)
-
+    testsuite_list = get_xmind_testsuites(xmind_file, options=options)
+    suite_data_list = testsuites_to_testsuite_list(testsuite_list)
     logging.info('Convert XMind file(%s) to testsuite data list successfully!', xmind_file)
     return suite_data_list
 
 
-def get_xmind_testcase_list(xmind_file):
+def testsuites_to_testsuite_list(testsuites):
+    """Count the statistics of parsed testsuites and convert them to a list of testsuite data
+
+    :param testsuites: a list of `xmind2testcase.metadata.TestSuite`
+    :return: a list of testsuite data
+    """
+    count_testsuite_statistics(testsuites)
+    return [testsuite.to_dict() for testsuite in testsuites]
+
+
+def count_testsuite_statistics(testsuites):
+    """Set the testcase results of every testsuite to `TestSuite.statistics`, from the counts of the parser"""
+    for testsuite in testsuites:
+        stats = get_testsuite_statistics(testsuite)
+        for sub_suite, sub_stats in zip(testsuite.sub_suites, stats.children):
+            sub_suite.statistics = sub_stats.result_summary()
+        testsuite.statistics = stats.result_summary()
+
+        abnormal = stats.case_num - sum(stats.results.get(result, 0) for result in TestResult)
+        if abnormal:
+            logging.warning('%s testcase results of testsuite(%s) are abnormal, please check them', abnormal,
+                            testsuite.name)
+
+
+def get_testsuite_statistics(testsuite):
+    """Return the `xmind2testcase.metadata.TestStatistics` of a testsuite
+
+    They are counted while parsing, a testsuite built by hand or loaded from an old cache is counted here.
+    """
+    stats = getattr(testsuite, 'stats', None)
+    if stats is None:
+        stats = TestStatistics(testsuite.name)
+        for case in testsuite.testcase_list or []:
+            stats.count(case)
+        for sub_suite in testsuite.sub_suites or []:
+            stats.add_child(get_testsuite_statistics(sub_suite))
+    return stats
+
+
+def get_xmind_statistics(xmind_file, cache=None, options=None):
+    """Load the XMind file and get the statistics of every sheet, no testcase data is made
+
+    :param xmind_file: the target XMind file
+    :param cache: an optional `xmind2testcase.cache.ParseCache`, an unchanged file is not parsed again
+    :return: a list of statistics dicts, see `testsuites_to_statistics`
+    """
+    xmind_file = get_absolute_path(xmind_file)
+    testsuites = get_xmind_testsuites(xmind_file, cache, options)
+    return testsuites_to_statistics(testsuites)
+
+
+def testsuites_to_statistics(testsuites):
+    """Return the statistics of parsed testsuites, one dict per sheet
+
+    A dict has the name, case_num and the counts by result, importance and execution_type of a sheet, its
+    'topics' are the same dicts of the sub testsuites and the intermediate topics under them, flattened in
+    pre-order with their 'level' and 'parent' index, see `xmind2testcase.metadata.TestStatistics.to_dict`.
+    """
+    return [get_testsuite_statistics(testsuite).to_dict() for testsuite in testsuites]
+
+
+def get_xmind_testcase_list(xmind_file, options=None):
     """Load the XMind file and get all testcase in it
 
     :param xmind_file: the target XMind file
@@ -89,55 +187,171 @@ def get_xmind_testcase_list(xmind_file):
     """
     xmind_file = get_absolute_path(xmind_file)
     logging.debug('Start converting XMind file(%s) to testcases dict data...', xmind_file)
-    testsuites = get_xmind_testsuites(xmind_file)
-    testcases = []
+    testsuites = get_xmind_testsuites(xmind_file, options=options)
+    testcases = testsuites_to_testcase_list(testsuites)
+    logging.debug('Convert XMind file(%s) to testcases dict data successfully!', xmind_file)
+    return testcases
+
+
+def testsuites_to_testcase_list(testsuites):
+    """Flatten parsed testsuites to a list of testcase data
+
+    :param testsuites: a list of `xmind2testcase.metadata.TestSuite`
+    :return: a list of testcase data
+    """
+    return [case_data.to_dict() for case_data in iter_testsuites_testcase_data(testsuites)]
 
+
+def iter_testsuites_testcase_data(testsuites):
+    """Iterate the testcase data of parsed testsuites one by one, as lazy `xmind2testcase.metadata.TestCaseView`"""
     for testsuite in testsuites:
         product = testsuite.name
         for suite in testsuite.sub_suites:
             for case in suite.testcase_list:
-                case_data = case.to_dict()
-                case_data['product'] = product
-                case_data['suite'] = suite.name
-                testcases.append(case_data)
+                yield gen_testcase_data(product, suite.name, case)
 
-    logging.debug('Convert XMind file(%s) to testcases dict data successfully!', xmind_file)
-    return testcases
 
+def query_testsuites_testcase_data(testsuites, offset=0, limit=None, suite=None, importance=None, result=None):
+    """Filter the testcases of parsed testsuites and return one page of them
 
-def xmind_testsuite_to_json_file(xmind_file):
-    """Convert XMind file to a testsuite json file"""
+    Only the testcases of the page are turned into testcase data, the others are just counted.
+
+    :param suite: only the testcases of the sub testsuites of this name
+    :param importance: only the testcases of this priority
+    :param result: only the testcases of this `xmind2testcase.metadata.TestResult`
+    :return: (number of the matched testcases, testcase data of the matched testcases [offset, offset + limit))
+    """
+    total = 0
+    page = []
+    for testsuite in testsuites:
+        product = testsuite.name
+        for sub_suite in testsuite.sub_suites:
+            if suite is not None and sub_suite.name != suite:
+                continue
+            for case in sub_suite.testcase_list:
+                if importance is not None and case.importance != importance:
+                    continue
+                if result is not None and case.result != result:
+                    continue
+                if total >= offset and (limit is None or total < offset + limit):
+                    page.append(gen_testcase_data(product, sub_suite.name, case))
+                total += 1
+
+    return total, page
+
+
+def iter_xmind_testcase_data(xmind_file, options=None):
+    """Load the XMind file and yield its testcase data as soon as each testcase is parsed
+
+    No testsuite or testcase list is kept, so the memory doesn't grow with the number of testcases.
+    """
     xmind_file = get_absolute_path(xmind_file)
-    logging.info('Start converting XMind file(%s) to testsuites json file...', xmind_file)
-    testsuites = get_xmind_testsuite_list(xmind_file)
-    testsuite_json_file = xmind_file[:-6] + '_testsuite.json'
+    for product, suite_name, case in iter_testcases(iter_xmind_content(xmind_file), options):
+        yield gen_testcase_data(product, suite_name, case)
 
-    if os.path.exists(testsuite_json_file):
-        os.remove(testsuite_json_file)
-        # logging.info('The testsuite json file already exists, return it directly: %s', testsuite_json_file)
-        # return testsuite_json_file
 
-    with open(testsuite_json_file, 'w', encoding='utf8') as f:
-        f.write(json.dumps(testsuites, indent=4, separators=(',', ': '), ensure_ascii=False))
-        logging.info('Convert XMind file(%s) to a testsuite json file(%s) successfully!', xmind_file, testsuite_json_file)
+def gen_testcase_data(product, suite_name, case):
+    return case.view(product=product, suite=suite_name)
 
+
+def xmind_testsuite_to_json_file(xmind_file, options=None, style=None):
+    """Convert XMind file to a testsuite json file
+
+    :param style: JSON_PRETTY (default), JSON_COMPACT or JSON_LINES, see `dump_json_array`
+    """
+    xmind_file = get_absolute_path(xmind_file)
+    logging.info('Start converting XMind file(%s) to testsuites json file...', xmind_file)
+    testsuites = get_xmind_testsuites(xmind_file, options=options)
+    testsuite_json_file = xmind_file[:-6] + '_testsuite' + JSON_EXTENSIONS[style or JSON_PRETTY]
+    testsuites_to_testsuite_json_file(testsuites, testsuite_json_file, style)
+    logging.info('Convert XMind file(%s) to a testsuite json file(%s) successfully!', xmind_file, testsuite_json_file)
+    return testsuite_json_file
+
+
+def testsuites_to_testsuite_json_file(testsuites, testsuite_json_file, style=None):
+    """Write parsed testsuites to a testsuite json file, one testsuite at a time"""
+    count_testsuite_statistics(testsuites)
+    write_json_array_file((testsuite.view() for testsuite in testsuites), testsuite_json_file, style)
     return testsuite_json_file
 
 
-def xmind_testcase_to_json_file(xmind_file):
-    """Convert XMind file to a testcase json file"""
+def xmind_testcase_to_json_file(xmind_file, options=None, style=None):
+    """Convert XMind file to a testcase json file
+
+    The testcases are written as soon as they are parsed, neither the testsuites nor the testcase list are kept.
+
+    :param style: JSON_PRETTY (default), JSON_COMPACT or JSON_LINES, see `dump_json_array`
+    """
     xmind_file = get_absolute_path(xmind_file)
     logging.info('Start converting XMind file(%s) to testcases json file...', xmind_file)
-    testcases = get_xmind_testcase_list(xmind_file)
-    testcase_json_file = xmind_file[:-6] + '.json'
-
-    if os.path.exists(testcase_json_file):
-        os.remove(testcase_json_file)
-        # logging.info('The testcase json file already exists, return it directly: %s', testcase_json_file)
-        # return testcase_json_file
+    testcase_json_file = xmind_file[:-6] + JSON_EXTENSIONS[style or JSON_PRETTY]
+    write_json_array_file(iter_xmind_testcase_data(xmind_file, options), testcase_json_file, style)
+    logging.info('Convert XMind file(%s) to a testcase json file(%s) successfully!', xmind_file, testcase_json_file)
+    return testcase_json_file
 
-    with open(testcase_json_file, 'w', encoding='utf8') as f:
-        f.write(json.dumps(testcases, indent=4, separators=(',', ': '), ensure_ascii=False))
-        logging.info('Convert XMind file(%s) to a testcase json file(%s) successfully!', xmind_file, testcase_json_file)
 
+def testsuites_to_testcase_json_file(testsuites, testcase_json_file, style=None):
+    """Write parsed testsuites to a testcase json file, one testcase at a time"""
+    write_json_array_file(iter_testsuites_testcase_data(testsuites), testcase_json_file, style)
     return testcase_json_file
+
+
+def write_json_array_file(items, json_file, style=None):
+    """Write the items to a json file with `dump_json_array`
+
+    The items are written into a temp file which replaces json_file when all are written, so a failed conversion
+    never leaves a truncated file.
+    """
+    fd, temp_file = new_temp_file(json_file)  # a unique name, concurrent writers of the same file never share it
+    try:
+        with open(fd, 'w', encoding='utf8') as f:
+            dump_json_array(items, f, style)
+        os.replace(temp_file, json_file)
+    finally:
+        if os.path.exists(temp_file):
+            os.remove(temp_file)
+
+
+def dump_json_array(items, f, style=None):
+    """Write the items to a text file one by one, only one item is encoded in memory at a time
+
+    :param items: an iterable of json data, e.g. lazy `xmind2testcase.metadata.ModelView`
+    :param style: JSON_PRETTY: a json array indented by 4 spaces, the same as `json.dumps(list(items), indent=4)`;
+                  JSON_COMPACT: a json array without any whitespace;
+                  JSON_LINES: newline-delimited json, an item per line
+    """
+    style = style or JSON_PRETTY
+    if style not in JSON_EXTENSIONS:
+        raise ValueError('Unsupported json style: {}'.format(style))
+
+    if style == JSON_LINES:
+        for item in items:
+            f.write(json.dumps(item, separators=(',', ':'), ensure_ascii=False, default=_json_default))
+            f.write('\n')
+        return
+
+    if style == JSON_PRETTY:
+        first_sep, item_sep, end = '\n    ', ',\n    ', '\n]'
+    else:
+        first_sep, item_sep, end = '', ',', ']'
+
+    f.write('[')
+    sep = None
+    for item in items:
+        if style == JSON_PRETTY:
+            # a json string never contains a raw newline, so each line of the item can be indented one more level
+            data = json.dumps(item, indent=4, separators=(',', ': '), ensure_ascii=False, default=_json_default)
+            data = data.replace('\n', '\n    ')
+        else:
+            data = json.dumps(item, separators=(',', ':'), ensure_ascii=False, default=_json_default)
+        f.write(item_sep if sep else first_sep)
+        f.write(data)
+        sep = item_sep
+    f.write(end if sep else ']')
+
+
+def _json_default(obj):
+    """Serialize the lazy model views, they are materialized one level at a time while json is encoding"""
+    if isinstance(obj, ModelView):
+        return dict(obj)
+    raise TypeError('Object of type {} is not JSON serializable'.format(obj.__class__.__name__))
@@ -0,0 +1,139 @@
+#!/usr/bin/env python
+# _*_ coding:utf-8 _*_
+from xmind2testcase.metadata import TestResult, ExecutionType
+
+"""
+The marker ids and label words that decide a testcase's result, priority and execution type
+
+The tables are compiled into dict lookups once, a topic is classified with one pass over its markers.
+Custom marker sets can be added with `Vocabulary.extend()` and passed to the parser by `ParserOptions(vocabulary=...)`.
+"""
+
+# marker id => test result
+RESULT_MARKERS = {
+    'symbol-right': TestResult.PASS,
+    'c_simbol-right': TestResult.PASS,
+    'symbol-wrong': TestResult.FAILED,
+    'c_simbol-wrong': TestResult.FAILED,
+    'symbol-pause': TestResult.BLOCKED,
+    'c_simbol-pause': TestResult.BLOCKED,
+    'symbol-minus': TestResult.SKIPPED,
+    'c_simbol-minus': TestResult.SKIPPED,
+}
+
+# when a topic has several result markers, the first result of this order wins
+RESULT_PRECEDENCE = (TestResult.PASS, TestResult.FAILED, TestResult.BLOCKED, TestResult.SKIPPED)
+
+# marker id => priority (the importance of the testcase)
+PRIORITY_MARKERS = {'priority-{}'.format(level): level for level in range(1, 10)}
+
+# label word (case insensitive) => execution type
+EXECUTION_TYPE_LABELS = {
+    '自动': ExecutionType.AUTOMATE,
+    '自动化': ExecutionType.AUTOMATE,
+    '自动的': ExecutionType.AUTOMATE,
+    'auto': ExecutionType.AUTOMATE,
+    'automate': ExecutionType.AUTOMATE,
+    'automated': ExecutionType.AUTOMATE,
+    'automation': ExecutionType.AUTOMATE,
+    '手动': ExecutionType.MANUAL,
+    '手工': ExecutionType.MANUAL,
+    'manual': ExecutionType.MANUAL,
+}
+
+_NOT_A_MARKER = (None, None, None)  # (result precedence, result, priority) of a marker that means nothing
+
+
+class Vocabulary(object):
+    __slots__ = ('result_markers', 'priority_markers', 'execution_type_labels', '_markers', '_labels')
+
+    def __init__(self, result_markers=None, priority_markers=None, execution_type_labels=None):
+        """
+        Vocabulary
+        :param result_markers: {marker id: `TestResult`}, default to RESULT_MARKERS
+        :param priority_markers: {marker id: priority}, default to PRIORITY_MARKERS
+        :param execution_type_labels: {label word: `ExecutionType`}, default to EXECUTION_TYPE_LABELS
+        """
+        self.result_markers = dict(RESULT_MARKERS if result_markers is None else result_markers)
+        self.priority_markers = dict(PRIORITY_MARKERS if priority_markers is None else priority_markers)
+        self.execution_type_labels = dict(EXECUTION_TYPE_LABELS if execution_type_labels is None else execution_type_labels)
+
+        precedence = {result: rank for rank, result in enumerate(RESULT_PRECEDENCE)}
+        self._markers = {}  # marker id => (result precedence, result, priority)
+        for marker, result in self.result_markers.items():
+            self._markers[marker] = (precedence.get(result, len(precedence)), TestResult(result), None)
+        for marker, priority in self.priority_markers.items():
+            rank, result, _ = self._markers.get(marker, _NOT_A_MARKER)
+            self._markers[marker] = (rank, result, int(priority))
+        self._labels = {label.lower(): ExecutionType(value) for label, value in self.execution_type_labels.items()}
+
+    def extend(self, result_markers=None, priority_markers=None, execution_type_labels=None):
+        """Return a new vocabulary with more (or overridden) markers and labels"""
+        return Vocabulary(dict(self.result_markers, **(result_markers or {})),
+                          dict(self.priority_markers, **(priority_markers or {})),
+                          dict(self.execution_type_labels, **(execution_type_labels or {})))
+
+    def classify_markers(self, markers):
+        """Return (test result, priority or None) of a topic's markers in one pass"""
+        if not isinstance(markers, list):
+            return TestResult.NON_EXECUTION, None
+
+        best_rank = None
+        result = TestResult.NON_EXECUTION
+        priority = None
+        for marker in markers:
+            entry = self._markers.get(marker)
+            if entry is None:
+                entry = self._classify_unknown_marker(marker)
+            rank, marker_result, marker_priority = entry
+            if rank is not None and (best_rank is None or rank < best_rank):
+                best_rank, result = rank, marker_result
+            if priority is None:
+                priority = marker_priority
+        return result, priority
+
+    def get_test_result(self, markers):
+        return self.classify_markers(markers)[0]
+
+    def get_priority(self, markers):
+        if not isinstance(markers, list):
+            return None
+        for marker in markers:
+            entry = self._markers.get(marker)
+            if entry is None:
+                entry = self._classify_unknown_marker(marker)
+            if entry[2] is not None:
+                return entry[2]
+        return None
+
+    def get_execution_type(self, label):
+        """Return the `ExecutionType` of a label, or None if the label doesn't mean any execution type"""
+        return self._labels.get(label.lower())
+
+    def to_dict(self):
+        return {'result_markers': self.result_markers,
+                'priority_markers': self.priority_markers,
+                'execution_type_labels': self.execution_type_labels}
+
+    def __eq__(self, other):
+        return isinstance(other, Vocabulary) and self.to_dict() == other.to_dict()
+
+    def __repr__(self):
+        return 'Vocabulary({!r})'.format(self.to_dict())
+
+    def __getstate__(self):
+        return self.to_dict()
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    def _classify_unknown_marker(self, marker):
+        """A marker out of the tables: 'priority-n' of other marker sets still means priority n, as it always did"""
+        entry = _NOT_A_MARKER
+        if isinstance(marker, str) and marker.startswith('priority') and marker[-1:].isdigit():
+            entry = (None, None, int(marker[-1]))
+        self._markers[marker] = entry  # remember it, every distinct marker id is only classified once
+        return entry
+
+
+DEFAULT_VOCABULARY = Vocabulary()
@@ -3,26 +3,9 @@
 import csv
 import logging
 import os
-from xmind2testcase.utils import get_xmind_testcase_list, get_absolute_path
-
-here = os.path.abspath(os.path.dirname(__file__))
-# 将日志文件名 'running.log' 与 here 拼接起来，得到完整的日志文件路径： log_file
-log_file = os.path.join(here, 'running.log')
-
-# log handler
-# 创建日志格式器（formatter）：包含了时间、日志名称、日志级别、模块名和函数名等信息。
-formatter = logging.Formatter('%(asctime)s  %(name)s  %(levelname)s  [%(module)s - %(funcName)s]: %(message)s')
-# 创建文件处理器（file handler）file_handler：传入日志文件路径 log_file 和编码方式 'UTF-8'
-file_handler = logging.FileHandler(log_file, encoding='UTF-8')
-# 通过 setFormatter() 方法将前面创建的日志格式器 formatter 应用到文件处理器上
-file_handler.setFormatter(formatter)
-# 最后，通过 setLevel() 方法设置文件处理器的日志级别为 logging.DEBUG，表示输出所有级别的日志，包括 DEBUG、INFO、WARNING、ERROR 和 CRITICAL 等级别的日志信息。
-file_handler.setLevel(logging.DEBUG)
-
-root_logger = logging.getLogger()
-root_logger.addHandler(file_handler)
-# root_logger.addHandler(stream_handler)
-root_logger.setLevel(logging.DEBUG)
+from xmind2testcase.log import setup_logging
+from xmind2testcase.utils import get_absolute_path, iter_xmind_testcase_data, iter_testsuites_testcase_data, \
+    new_temp_file
 
 """
 Convert XMind fie to Zentao testcase csv file 
@@ -31,28 +14,41 @@ Zentao official document about import CSV testcase file: https://www.zentao.net/
 """
 
 
-def xmind_to_zentao_csv_file(xmind_file):
+def xmind_to_zentao_csv_file(xmind_file, options=None):
     """Convert XMind file to a zentao csv file"""
     xmind_file = get_absolute_path(xmind_file)
     logging.debug('Start converting XMind file(%s) to zentao file...', xmind_file)
-    testcases = get_xmind_testcase_list(xmind_file)
+    zentao_file = xmind_file[:-6] + '.csv'
+    # stream the testcases from the parser to the csv writer, a row is written as soon as its testcase is parsed
+    testcases = iter_xmind_testcase_data(xmind_file, options)
+    write_zentao_csv_file(testcases, zentao_file)
+    logging.debug('Convert XMind file(%s) to a zentao csv file(%s) successfully!', xmind_file, zentao_file)
+    return zentao_file
 
-    fileheader = ["所属模块", "用例标题", "前置条件", "步骤", "预期", "关键词", "优先级", "用例类型", "适用阶段"]
-    zentao_testcase_rows = [fileheader]
-    for testcase in testcases:
-        row = gen_a_testcase_row(testcase)
-        zentao_testcase_rows.append(row)
 
-    zentao_file = xmind_file[:-6] + '.csv'
-    if os.path.exists(zentao_file):
-        os.remove(zentao_file)
-        # logging.info('The zentao csv file already exists, return it directly: %s', zentao_file)
-        # return zentao_file
+def testsuites_to_zentao_csv_file(testsuites, zentao_file):
+    """Write parsed testsuites to a zentao csv file"""
+    testcases = iter_testsuites_testcase_data(testsuites)
+    return write_zentao_csv_file(testcases, zentao_file)
+
+
+def write_zentao_csv_file(testcases, zentao_file):
+    """Write an iterable of testcase data to a zentao csv file row by row"""
+    fileheader = ["所属模块", "用例标题", "前置条件", "步骤", "预期", "关键词", "优先级", "用例类型", "适用阶段"]
 
-    with open(zentao_file, 'w', encoding='utf8') as f:
-        writer = csv.writer(f)
-        writer.writerows(zentao_testcase_rows)
-        logging.debug('Convert XMind file(%s) to a zentao csv file(%s) successfully!', xmind_file, zentao_file)
+    # write a temp file in the same directory and replace zentao_file with it once all rows are written, so a failed
+    # conversion never leaves a half-written csv file, and concurrent writers never write into the same file
+    fd, temp_file = new_temp_file(zentao_file)
+    try:
+        with open(fd, 'w', encoding='utf8') as f:
+            writer = csv.writer(f)
+            writer.writerow(fileheader)
+            for testcase in testcases:
+                writer.writerow(gen_a_testcase_row(testcase))
+        os.replace(temp_file, zentao_file)
+    finally:
+        if os.path.exists(temp_file):
+            os.remove(temp_file)
 
     return zentao_file
 
@@ -80,16 +76,16 @@ def gen_case_module(module_name):
 
 
 def gen_case_step_and_expected_result(steps):
-    case_step = ''
-    case_expected_result = ''
+    case_steps = []
+    case_expected_results = []
 
     for step_dict in steps:
-        case_step += str(step_dict['step_number']) + '. ' + step_dict['actions'].replace('\n', '').strip() + '\n'
-        case_expected_result += str(step_dict['step_number']) + '. ' + \
-            step_dict['expectedresults'].replace('\n', '').strip() + '\n' \
-            if step_dict.get('expectedresults', '') else ''
+        step_number = str(step_dict['step_number'])
+        case_steps.append(step_number + '. ' + step_dict['actions'].replace('\n', '').strip() + '\n')
+        if step_dict.get('expectedresults', ''):
+            case_expected_results.append(step_number + '. ' + step_dict['expectedresults'].replace('\n', '').strip() + '\n')
 
-    return case_step, case_expected_result
+    return ''.join(case_steps), ''.join(case_expected_results)
 
 
 def gen_case_priority(priority):
@@ -109,6 +105,7 @@ def gen_case_type(case_type):
 
 
 if __name__ == '__main__':
+    setup_logging(log_file=os.path.join(os.path.abspath(os.path.dirname(__file__)), 'running.log'))
     # xmind_file = '../docs/zentao_testcase_template.xmind'
     xmind_file= 'E:/Desktop/myXmindTestCase/Xmind2TestCase模板_空文件.xmind'
     zentao_csv_file = xmind_to_zentao_csv_file(xmind_file)